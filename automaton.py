@@ -0,0 +1,387 @@
+"""
+automaton.py
+
+Aho-Corasick multi-pattern matcher used by the counting engines in `stats.py`.
+
+The regex engine in `stats.count_frequencies` runs one `re.findall` per
+vocabulary term, so its cost grows with (number of terms x text length).
+The automaton in this module finds every term in a single left-to-right
+scan of the text and then applies the same rules as the regex path:
+
+- a match must pass the `\\b` word-boundary check on both of its ends
+- matches of the same term never overlap (just like `re.findall`)
+
+That is the "independent" overlap policy: different terms are counted
+independently, so "vector database" also counts as "database". Terms can
+be put into groups (the surface forms of one vocabulary entry, for
+example); overlapping matches within a group are resolved leftmost-longest,
+so one mention is counted once for its group. The scanner
+also implements two other policies (see `OVERLAP_POLICIES`) in the same pass:
+
+- "leftmost-longest": one mention is one match. Of the matches that start
+  at the leftmost position the longest is kept, and the scan resumes after
+  its end, so "vector database" is counted only as "vector database".
+- "all-overlapping": every occurrence of every term is counted, including
+  overlapping occurrences of the same term.
+
+Text must already be lowercased by the caller, exactly like the regex path.
+The automaton can also be built over UTF-8 encoded terms and run directly on
+lowercased bytes (for example a memory-mapped file).
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# How matches that overlap each other are counted (see the module docstring)
+OVERLAP_POLICIES = ("independent", "leftmost-longest", "all-overlapping")
+DEFAULT_OVERLAP = "independent"
+
+
+def is_word_char(ch: str) -> bool:
+    """
+    Return True if `ch` is a regex word character (`\\w` for str patterns).
+    """
+    return ch.isalnum() or ch == "_"
+
+
+def _str_word_before(buffer: str, index: int) -> bool:
+    """
+    Return True if the character right before `index` is a word character.
+    """
+    return index > 0 and is_word_char(buffer[index - 1])
+
+
+def _str_word_at(buffer: str, index: int) -> bool:
+    """
+    Return True if the character at `index` is a word character.
+    """
+    return index < len(buffer) and is_word_char(buffer[index])
+
+
+def _utf8_word_before(buffer: bytes, index: int) -> bool:
+    """
+    Return True if the UTF-8 character ending right before `index` is a word character.
+    """
+    if index <= 0:
+        return False
+    byte = buffer[index - 1]
+    if byte < 0x80:
+        return is_word_char(chr(byte))
+
+    # Walk back over continuation bytes to the lead byte of the character
+    start = index - 1
+    while start > 0 and 0x80 <= buffer[start] < 0xC0:
+        start -= 1
+    return is_word_char(buffer[start:index].decode("utf-8", "replace")[-1])
+
+
+def _utf8_word_at(buffer: bytes, index: int) -> bool:
+    """
+    Return True if the UTF-8 character starting at `index` is a word character.
+    """
+    if index >= len(buffer):
+        return False
+    byte = buffer[index]
+    if byte < 0x80:
+        return is_word_char(chr(byte))
+
+    end = index + 1
+    while end < len(buffer) and 0x80 <= buffer[end] < 0xC0:
+        end += 1
+    return is_word_char(buffer[index:end].decode("utf-8", "replace")[0])
+
+
+class TermAutomaton:
+    """
+    Aho-Corasick automaton over a fixed list of (lowercased) terms.
+
+    Transitions are stored as one dict per state. Missing transitions are
+    resolved through the failure links on first use and then cached in the
+    same dict, so after a short warm-up every character costs one lookup.
+
+    With `utf8=True` the terms are encoded to UTF-8 and the automaton runs
+    over bytes instead of characters.
+
+    `groups` gives the group number of every term (by default each term is
+    its own group); see the "independent" policy in the module docstring.
+    """
+
+    def __init__(self, terms: Sequence[str], utf8: bool = False, groups: Optional[Sequence[int]] = None) -> None:
+        # Unique, non-empty terms in their original order, with their group numbers
+        kept: Dict[str, int] = {}
+        for index, term in enumerate(terms):
+            if term and term not in kept:
+                kept[term] = index if groups is None else groups[index]
+        self.terms: List[str] = list(kept)
+        self.groups: List[int] = list(kept.values())
+        self.utf8 = utf8
+        patterns = [term.encode("utf-8") for term in self.terms] if utf8 else self.terms
+        self._lengths: List[int] = [len(pattern) for pattern in patterns]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for term_id, pattern in enumerate(patterns):
+            self._insert(pattern, term_id)
+        self._link()
+
+        # Whether each term starts / ends with a word character.
+        # Used for the `\b` checks around a match.
+        self._first_is_word = [is_word_char(term[0]) for term in self.terms]
+        self._last_is_word = [is_word_char(term[-1]) for term in self.terms]
+
+    @property
+    def max_length(self) -> int:
+        """
+        Length of the longest term (0 if there are no terms).
+        """
+        return max(self._lengths, default=0)
+
+    def _insert(self, pattern: Sequence, term_id: int) -> None:
+        """
+        Add one pattern to the trie.
+        """
+        state = 0
+        for symbol in pattern:
+            nxt = self._goto[state].get(symbol)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[state][symbol] = nxt
+            state = nxt
+        self._output[state] = self._output[state] + (term_id,)
+
+    def _link(self) -> None:
+        """
+        Compute failure links and merged outputs with a breadth-first walk.
+        """
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for symbol, child in self._goto[state].items():
+                queue.append(child)
+                probe = self._fail[state]
+                while probe and symbol not in self._goto[probe]:
+                    probe = self._fail[probe]
+                self._fail[child] = self._goto[probe].get(symbol, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _transition(self, state: int, symbol) -> int:
+        """
+        Resolve a missing transition through the failure links and cache it.
+        """
+        probe = state
+        while True:
+            if probe == 0:
+                nxt = self._goto[0].get(symbol, 0)
+                break
+            probe = self._fail[probe]
+            nxt = self._goto[probe].get(symbol)
+            if nxt is not None:
+                break
+        self._goto[state][symbol] = nxt
+        return nxt
+
+    def scan(self, text: Sequence, state: int = 0) -> Tuple[int, List[Tuple[int, Tuple[int, ...]]]]:
+        """
+        Run the automaton over `text`, starting from `state`.
+
+        Returns the final state and a list of `(end, term_ids)` hits, where
+        `end` is the exclusive end index of the raw (unchecked) matches.
+        """
+        goto = self._goto
+        output = self._output
+        hits = []
+        for index, symbol in enumerate(text):
+            nxt = goto[state].get(symbol)
+            if nxt is None:
+                nxt = self._transition(state, symbol)
+            state = nxt
+            if output[state]:
+                hits.append((index + 1, output[state]))
+        return state, hits
+
+    def scanner(self, record: bool = False, overlap: str = DEFAULT_OVERLAP) -> "TermScanner":
+        """
+        Create an incremental scanner for lowercased text
+        (`str`, or UTF-8 `bytes` when the automaton was built with `utf8=True`).
+
+        With `record=True` the scanner also keeps every accepted match.
+        `overlap` is one of `OVERLAP_POLICIES`.
+        """
+        if self.utf8:
+            return TermScanner(self, _utf8_word_before, _utf8_word_at, record, overlap)
+        return TermScanner(self, _str_word_before, _str_word_at, record, overlap)
+
+    def count(self, text_lower: str, overlap: str = DEFAULT_OVERLAP) -> Dict[str, int]:
+        """
+        Count every term in an already lowercased text in one pass.
+        """
+        scanner = self.scanner(overlap=overlap)
+        scanner.feed(text_lower)
+        return scanner.finish()
+
+
+class TermScanner:
+    """
+    Counts accepted matches over a text that may arrive in several chunks.
+
+    A short tail of the previous chunk is kept so boundary checks work for
+    terms that cross a chunk edge. Matches that end exactly at the edge wait
+    for the first character of the next chunk (or the end of the text).
+
+    With `record=True`, every accepted match is appended to `matches` as
+    `(term_id, start, end)`; callers may take and clear the list at any time.
+
+    With the "leftmost-longest" policy (and for terms that share a group
+    under the "independent" policy), matches that pass the boundary checks
+    are held back until no later match can start at or before them, that is
+    until the scan is one term length past their start. They are then
+    chosen leftmost first, longest first, and recorded in text order.
+    """
+
+    def __init__(
+        self,
+        automaton: TermAutomaton,
+        word_before,
+        word_at,
+        record: bool = False,
+        overlap: str = DEFAULT_OVERLAP,
+    ) -> None:
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown overlap policy: {overlap!r} (expected one of {OVERLAP_POLICIES})")
+        self._automaton = automaton
+        self._overlap = overlap
+        self._word_before = word_before
+        self._word_at = word_at
+        # Longest term plus room for one (multi-byte) character before it
+        self._context = automaton.max_length + 4
+        self._state = 0
+        self._offset = 0
+        self._tail = None
+        self._pending: List[Tuple[int, int, int]] = []
+        self._last_end = [0] * len(automaton.terms)
+        self._counts = [0] * len(automaton.terms)
+        # Terms whose matches are chosen leftmost-longest: all of them, or
+        # under the "independent" policy those that share their group
+        sizes = Counter(automaton.groups)
+        if overlap == "leftmost-longest":
+            self._chosen = [True] * len(automaton.terms)
+        elif overlap == "independent":
+            self._chosen = [sizes[group] > 1 for group in automaton.groups]
+        else:
+            self._chosen = [False] * len(automaton.terms)
+        # Held-back matches, and the end of the last chosen match per group
+        # (one group for everything under "leftmost-longest")
+        self._candidates: List[Tuple[int, int, int]] = []
+        self._chosen_end: Dict[int, int] = {}
+        self.matches: Optional[List[Tuple[int, int, int]]] = [] if record else None
+
+    def _accept(self, term_id: int, start: int, end: int, buffer, base: int) -> None:
+        """
+        Count one raw match if it passes the boundary and overlap rules.
+
+        `start` and `end` are positions in the whole text; `base` is the
+        position of `buffer[0]` in the whole text.
+        """
+        chosen = self._chosen[term_id]
+        if self._overlap == "independent" and not chosen and start < self._last_end[term_id]:
+            return
+        if self._word_before(buffer, start - base) == self._automaton._first_is_word[term_id]:
+            return
+        if self._word_at(buffer, end - base) == self._automaton._last_is_word[term_id]:
+            return
+        if chosen:
+            if start >= self._chosen_end.get(self._group(term_id), 0):
+                self._candidates.append((term_id, start, end))
+            return
+        self._last_end[term_id] = end
+        self._record(term_id, start, end)
+
+    def _record(self, term_id: int, start: int, end: int) -> None:
+        """
+        Count one match that is final.
+        """
+        self._counts[term_id] += 1
+        if self.matches is not None:
+            self.matches.append((term_id, start, end))
+
+    def feed(self, chunk) -> None:
+        """
+        Scan the next chunk of lowercased text.
+
+        Byte chunks must not split a UTF-8 character.
+        """
+        if not chunk:
+            return
+        if self._tail is None:
+            self._tail = chunk[:0]
+
+        buffer = self._tail + chunk
+        shift = len(self._tail)
+        base = self._offset - shift
+
+        pending, self._pending = self._pending, []
+        for term_id, start, end in pending:
+            self._accept(term_id, start, end, buffer, base)
+
+        lengths = self._automaton._lengths
+        self._state, hits = self._automaton.scan(chunk, self._state)
+        for end_index, term_ids in hits:
+            end = self._offset + end_index
+            for term_id in term_ids:
+                start = end - lengths[term_id]
+                if end_index == len(chunk):
+                    self._pending.append((term_id, start, end))
+                else:
+                    self._accept(term_id, start, end, buffer, base)
+
+        self._offset += len(chunk)
+        self._tail = buffer[-self._context:]
+        # Hits still to come (and those pending at the edge) start at or after this
+        self._choose(self._offset - self._automaton.max_length)
+
+    def finish(self) -> Dict[str, int]:
+        """
+        Resolve matches at the very end of the text and return the counts.
+        """
+        if self._pending:
+            base = self._offset - len(self._tail)
+            for term_id, start, end in self._pending:
+                self._accept(term_id, start, end, self._tail, base)
+            self._pending = []
+        self._choose(self._offset + 1)
+        return dict(zip(self._automaton.terms, self._counts))
+
+    def _group(self, term_id: int) -> int:
+        """
+        Return the group within which matches of a term are chosen (-1: all terms).
+        """
+        if self._overlap == "leftmost-longest":
+            return -1
+        return self._automaton.groups[term_id]
+
+    def _choose(self, limit: int) -> None:
+        """
+        Settle the held-back matches that start before `limit`, leftmost-longest per group.
+        """
+        if not self._candidates:
+            return
+        # Leftmost first; of matches with the same start, the longest first
+        self._candidates.sort(key=lambda match: (match[1], match[1] - match[2]))
+        waiting = []
+        for term_id, start, end in self._candidates:
+            group = self._group(term_id)
+            if start < self._chosen_end.get(group, 0):
+                # Overlaps a chosen match
+                continue
+            if start >= limit:
+                waiting.append((term_id, start, end))
+                continue
+            self._chosen_end[group] = end
+            self._record(term_id, start, end)
+        self._candidates = waiting
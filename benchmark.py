@@ -0,0 +1,262 @@
+"""
+benchmark.py
+
+Benchmark suite for the counting engines in stats.py.
+
+A deterministic generator writes synthetic research corpora: vocabulary
+terms are drawn from a Zipf distribution and embedded in filler text.
+Every counting engine (and the vocabulary parsers) is then timed on each corpus,
+and the results are written as JSON so that runs can be compared:
+
+    python benchmark.py --sizes 10KB 1MB 100MB --terms 10 1000 100000
+
+For every engine the report contains the best wall time, the first (cold)
+run time (without any automaton or index left over from other engines),
+the throughput in MB/s and the peak Python memory measured with
+`tracemalloc` in a separate run.
+
+The index engines build their index in the cold run and only load it in
+the later ones, so their rows are marked `"index": "warm"` and also report
+the time and peak memory of building the index (`build_seconds`,
+`build_peak_memory_bytes`).
+"""
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+import stats
+from vocabulary import parse_vocabulary
+
+# Common English words used as filler between vocabulary terms
+FILLER_WORDS = (
+    "the of and to in is that for it as with was on be by this are from or an "
+    "at which have not has but can more their will these other such into also "
+    "data model system results based used using new between each two both than "
+    "study approach analysis performance however research information process"
+).split()
+
+SYLLABLES = ("ka", "lo", "mi", "ren", "tos", "vy", "qua", "zen", "dor", "pel", "sha", "nix")
+
+_SIZE_UNITS = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+
+# Engines that count with an index saved in the cache: engine -> index kind (see `stats.INDEX_KINDS`)
+INDEX_ENGINES = {"index": "positional", "suffix": "suffix"}
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a size such as "10KB", "1MB" or "1GB" into a number of bytes.
+    """
+    text = text.strip().upper()
+    for unit in sorted(_SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[: -len(unit)]) * _SIZE_UNITS[unit])
+    return int(text)
+
+
+def make_terms(count: int, seed: int = 0) -> List[str]:
+    """
+    Generate `count` distinct pseudo-word terms of one to three words.
+    """
+    rng = random.Random(seed)
+    terms: Dict[str, None] = {}
+    while len(terms) < count:
+        words = [
+            "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for _ in range(rng.choice((1, 1, 2, 3)))
+        ]
+        terms[" ".join(words)] = None
+    return list(terms)
+
+
+def make_vocabulary_md(terms: List[str]) -> str:
+    """
+    Render terms in the `vocabulary.md` format understood by `extract_terms` and `parse_vocabulary`.
+    """
+    lines = ["# Synthetic vocabulary", ""]
+    for number, term in enumerate(terms, start=1):
+        lines += [f"## {number}. {term.title()}", f"Definition of {term}.", ""]
+    return "\n".join(lines)
+
+
+def write_corpus(
+    path: Path,
+    size: int,
+    terms: List[str],
+    seed: int = 0,
+    term_ratio: float = 0.05,
+    zipf_exponent: float = 1.1,
+) -> None:
+    """
+    Write a synthetic research text of about `size` bytes.
+
+    About `term_ratio` of all words are vocabulary terms, chosen with Zipf
+    weights (the i-th term has weight 1 / i**zipf_exponent). The same
+    arguments always produce the same file.
+    """
+    rng = random.Random(seed)
+    cumulative = np.cumsum(1.0 / np.arange(1, len(terms) + 1) ** zipf_exponent).tolist()
+    written = 0
+    with path.open("w", encoding="utf-8", newline="\n") as handle:
+        while written < size:
+            words = rng.choices(FILLER_WORDS, k=1000)
+            for slot in range(len(words)):
+                if rng.random() < term_ratio:
+                    term = rng.choices(terms, cum_weights=cumulative)[0]
+                    words[slot] = term.title() if rng.random() < 0.3 else term
+            # Roughly one sentence per twelve words and one paragraph per hundred
+            block = []
+            for start in range(0, len(words), 12):
+                block.append(" ".join(words[start : start + 12]).capitalize() + ".")
+            text = "\n\n".join(" ".join(block[i : i + 8]) for i in range(0, len(block), 8)) + "\n\n"
+            handle.write(text)
+            written += len(text.encode("utf-8"))
+
+
+def _measure(function, repeat: int) -> Dict[str, float]:
+    """
+    Time `function` `repeat` times and measure its peak memory in one extra run.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "cold_seconds": timings[0],
+        "seconds": min(timings),
+        "peak_memory_bytes": peak,
+        "result": result,
+    }
+
+
+def run_benchmarks(
+    sizes: List[int],
+    term_counts: List[int],
+    engines: List[str],
+    workdir: Path,
+    repeat: int = 3,
+    seed: int = 0,
+) -> List[Dict]:
+    """
+    Time every engine on every (corpus size, vocabulary size) combination.
+    """
+    results = []
+
+    for term_count in term_counts:
+        terms = make_terms(term_count, seed=seed)
+        vocab_md = make_vocabulary_md(terms)
+        measured = _measure(lambda: stats.extract_terms(vocab_md), repeat)
+        results.append(_report("extract_terms", len(vocab_md.encode("utf-8")), term_count, measured))
+        measured = _measure(lambda: parse_vocabulary(vocab_md), repeat)
+        results.append(_report("parse_vocabulary", len(vocab_md.encode("utf-8")), term_count, measured))
+
+        for size in sizes:
+            corpus = workdir / f"corpus-{size}-{term_count}-{seed}.md"
+            if not corpus.exists():
+                write_corpus(corpus, size, terms, seed=seed)
+            size_bytes = corpus.stat().st_size
+
+            reference = None
+            for engine in engines:
+                # Every engine starts cold: no automaton compiled by an earlier
+                # engine and no index saved by an earlier run
+                stats._compile_terms.cache_clear()
+                cache_dir = workdir / "cache" / engine
+                shutil.rmtree(cache_dir, ignore_errors=True)
+                measured = _measure(lambda: stats.count_file(corpus, terms, engine=engine, cache_dir=cache_dir), repeat)
+                if reference is None:
+                    reference = measured["result"]
+                report = _report(engine, size_bytes, term_count, measured)
+                report["consistent"] = measured["result"] == reference
+                built = ""
+                if engine in INDEX_ENGINES:
+                    # Only the cold run above built the index; time building it on its own
+                    index_class = stats._index_class(INDEX_ENGINES[engine])
+                    building = _measure(lambda: index_class.build(stats.load_text(corpus).lower()), repeat)
+                    report["index"] = "warm"
+                    report["build_seconds"] = building["seconds"]
+                    report["build_peak_memory_bytes"] = building["peak_memory_bytes"]
+                    built = f"  (warm index, built in {building['seconds']:.3f} s)"
+                results.append(report)
+                print(
+                    f"{engine:>13}  {size_bytes / 1e6:10.2f} MB  {term_count:7d} terms  "
+                    f"{report['seconds']:8.3f} s  {report['mb_per_second']:9.2f} MB/s  "
+                    f"peak {report['peak_memory_bytes'] / 1e6:8.2f} MB{built}"
+                )
+    return results
+
+
+def _report(name: str, size_bytes: int, term_count: int, measured: Dict) -> Dict:
+    """
+    Build one JSON result row.
+    """
+    seconds = measured["seconds"]
+    return {
+        "engine": name,
+        "size_bytes": size_bytes,
+        "terms": term_count,
+        "seconds": seconds,
+        "cold_seconds": measured["cold_seconds"],
+        "mb_per_second": size_bytes / 1e6 / seconds if seconds > 0 else None,
+        "peak_memory_bytes": measured["peak_memory_bytes"],
+    }
+
+
+def main() -> None:
+    """
+    Command-line entry point.
+    """
+    all_engines = list(stats.COUNT_ENGINES) + list(stats.FILE_ENGINES)
+
+    parser = argparse.ArgumentParser(description="Benchmark the vocabulary counting engines.")
+    parser.add_argument("--sizes", nargs="+", default=["10KB", "1MB", "10MB"], help="corpus sizes, e.g. 10KB 1MB 1GB")
+    parser.add_argument("--terms", nargs="+", type=int, default=[10, 1000], help="vocabulary sizes")
+    parser.add_argument("--engines", nargs="+", default=all_engines, choices=all_engines)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per engine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, default=Path(".benchmark"), help="where corpora are generated")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+    args = parser.parse_args()
+
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    results = run_benchmarks(
+        [parse_size(size) for size in args.sizes],
+        args.terms,
+        args.engines,
+        args.workdir,
+        repeat=args.repeat,
+        seed=args.seed,
+    )
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=4), encoding="utf-8")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+cooccurrence.py
+
+Windowed term co-occurrence, computed in the same pass as counting.
+
+`CooccurrenceCounter` runs the Aho-Corasick scanner from `automaton.py` with
+match recording switched on, so the accepted matches (exactly the ones that
+are counted) are available right after every chunk. Their start positions
+are mapped to token or sentence numbers with one regex pass per chunk, and
+two matches of different terms co-occur when their numbers differ by at
+most `window`:
+
+- unit "token": the matches start within `window` tokens of each other
+- unit "sentence": they are within `window` sentences (0 = same sentence)
+
+Pairs are collected as flat NumPy arrays and aggregated into a symmetric
+term x term matrix stored in CSR form (upper triangle only). Memory grows
+with the number of distinct co-occurring pairs, never with n² terms.
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from automaton import DEFAULT_OVERLAP, TermAutomaton
+from stats import COOCCURRENCE_UNITS
+
+# Default window of every co-occurrence unit
+DEFAULT_WINDOWS = {"token": 10, "sentence": 0}
+
+# Start of every token / end of every sentence (a paragraph break also ends one)
+_UNIT_BOUNDARIES = {
+    "token": re.compile(r"\w+"),
+    "sentence": re.compile(r"[.!?]+\s|\n[^\S\n]*\n"),
+}
+
+# Longest run of the previous chunk kept for boundary detection
+_TAIL_LENGTH = 64
+
+# Compact the collected pair arrays after this many chunks
+_COMPACT_EVERY = 64
+
+
+class CooccurrenceMatrix:
+    """
+    Symmetric term x term co-occurrence counts in CSR form.
+
+    Only the upper triangle is stored: row `i` lists the terms `j > i` that
+    co-occur with term `i` (`indices`) and how often (`data`).
+    """
+
+    def __init__(self, terms: Sequence[str], indptr: np.ndarray, indices: np.ndarray, data: np.ndarray) -> None:
+        self.terms: List[str] = list(terms)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def from_keys(cls, terms: Sequence[str], keys: np.ndarray, counts: np.ndarray) -> "CooccurrenceMatrix":
+        """
+        Build the matrix from sorted, unique pair keys `row * len(terms) + column`.
+        """
+        size = len(terms)
+        rows = keys // max(size, 1)
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+        return cls(terms, indptr, (keys % max(size, 1)).astype(np.int32), counts.astype(np.int64))
+
+    @classmethod
+    def merge(cls, matrices: Sequence["CooccurrenceMatrix"]) -> "CooccurrenceMatrix":
+        """
+        Add up matrices over the same term list (for example one per document).
+        """
+        terms = matrices[0].terms
+        keys, counts = _aggregate(
+            [matrix._keys() for matrix in matrices],
+            [matrix.data for matrix in matrices],
+        )
+        return cls.from_keys(terms, keys, counts)
+
+    def fold(self, terms: Sequence[str], canonical: Mapping[str, str]) -> "CooccurrenceMatrix":
+        """
+        Merge the rows and columns of surface forms into their canonical terms.
+
+        `canonical` maps a form to a term of `terms`; pairs that fall onto the
+        same term are dropped.
+        """
+        index = {term: row for row, term in reversed(list(enumerate(terms)))}
+        mapped = np.array([index[canonical.get(form, form)] for form in self.terms], dtype=np.int64)
+        rows = mapped[np.repeat(np.arange(len(self.terms)), np.diff(self.indptr))]
+        columns = mapped[self.indices]
+        different = rows != columns
+        first = np.minimum(rows, columns)[different]
+        second = np.maximum(rows, columns)[different]
+        keys, counts = _aggregate([first * len(terms) + second], [self.data[different]])
+        return CooccurrenceMatrix.from_keys(terms, keys, counts)
+
+    def _keys(self) -> np.ndarray:
+        """
+        Return the pair key of every stored entry.
+        """
+        rows = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.indptr))
+        return rows * len(self.terms) + self.indices
+
+    @property
+    def nnz(self) -> int:
+        """
+        Number of distinct co-occurring term pairs.
+        """
+        return len(self.data)
+
+    def weight(self, first: str, second: str) -> int:
+        """
+        Return how often two terms co-occur.
+        """
+        row, column = sorted((self.terms.index(first), self.terms.index(second)))
+        start, end = self.indptr[row], self.indptr[row + 1]
+        found = start + np.searchsorted(self.indices[start:end], column)
+        if found < end and self.indices[found] == column:
+            return int(self.data[found])
+        return 0
+
+    def pairs(self) -> Iterator[Tuple[str, str, int]]:
+        """
+        Yield every co-occurring pair as `(term, term, count)`.
+        """
+        for row in range(len(self.terms)):
+            for entry in range(self.indptr[row], self.indptr[row + 1]):
+                yield self.terms[row], self.terms[self.indices[entry]], int(self.data[entry])
+
+    def top_pairs(self, limit: int) -> List[Tuple[str, str, int]]:
+        """
+        Return the `limit` strongest pairs, strongest first.
+        """
+        order = np.argsort(-self.data, kind="stable")[:limit]
+        keys = self._keys()[order]
+        size = len(self.terms)
+        return [
+            (self.terms[key // size], self.terms[key % size], int(count))
+            for key, count in zip(keys.tolist(), self.data[order].tolist())
+        ]
+
+    def save(self, path: Path) -> None:
+        """
+        Write the matrix and its term list to one `.npz` file.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as handle:
+            np.savez(
+                handle,
+                terms=np.array(self.terms, dtype=str),
+                indptr=self.indptr,
+                indices=self.indices,
+                data=self.data,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "CooccurrenceMatrix":
+        """
+        Read a matrix written by `save`.
+        """
+        with np.load(path) as data:
+            return cls(data["terms"].tolist(), data["indptr"], data["indices"], data["data"])
+
+
+def unit_boundaries(text: str, unit: str) -> List[int]:
+    """
+    Return the offsets in `text` where a token starts or a sentence ends.
+
+    A match whose start is at or after the n-th offset lies in unit n (see
+    `CooccurrenceCounter`).
+    """
+    if unit == "sentence":
+        return [match.end() for match in _UNIT_BOUNDARIES[unit].finditer(text)]
+    return [match.start() for match in _UNIT_BOUNDARIES[unit].finditer(text)]
+
+
+def _aggregate(keys: List[np.ndarray], counts: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sum the counts of equal keys; returns sorted unique keys and their totals.
+    """
+    if not keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    unique, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=np.concatenate(counts), minlength=len(unique))
+    return unique, totals.astype(np.int64)
+
+
+class CooccurrenceCounter:
+    """
+    Counts terms and their windowed co-occurrences over lowercased `str` chunks.
+
+    Chunks may be cut anywhere; `stats.iter_text_chunks` cuts them after
+    whitespace.
+    """
+
+    def __init__(
+        self,
+        automaton: TermAutomaton,
+        window: Optional[int] = None,
+        unit: str = "token",
+        overlap: str = DEFAULT_OVERLAP,
+    ) -> None:
+        if unit not in COOCCURRENCE_UNITS:
+            raise ValueError(f"Unknown co-occurrence unit: {unit!r} (expected one of {COOCCURRENCE_UNITS})")
+        self.terms = automaton.terms
+        self.window = DEFAULT_WINDOWS[unit] if window is None else window
+        self.unit = unit
+        self._scanner = automaton.scanner(record=True, overlap=overlap)
+        self._use_end = unit == "sentence"
+        # Matches that start up to one term length before the end of the text
+        # may still be accepted later
+        self._lookback = automaton.max_length
+        self._margin = self.window + automaton.max_length
+
+        self._offset = 0
+        self._tail = ""
+        # Unit boundaries that later matches may still need, and how many came before them
+        self._known = np.zeros(0, dtype=np.int64)
+        self._before_known = 0
+        # Recent matches that can still pair with later ones: (term ids, unit numbers)
+        self._carry_ids = np.zeros(0, dtype=np.int64)
+        self._carry_units = np.zeros(0, dtype=np.int64)
+        self._keys: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+
+    def feed(self, chunk: str) -> None:
+        """
+        Scan the next chunk of lowercased text.
+        """
+        if not chunk:
+            return
+        self._scanner.feed(chunk)
+
+        # The tail of the previous chunk lets boundaries that cross the chunk
+        # edge (a split paragraph break, a split token) be found exactly once
+        text = self._tail + chunk
+        shift = self._offset - len(self._tail)
+        positions = [position + shift for position in unit_boundaries(text, self.unit)]
+        if self._use_end:
+            positions = [position for position in positions if position > self._offset]
+        else:
+            positions = [position for position in positions if position >= self._offset]
+        stripped = len(text.rstrip())
+        self._tail = text[max(stripped - 1, 0) :][-_TAIL_LENGTH:]
+        self._known = np.concatenate((self._known, np.array(positions, dtype=np.int64)))
+
+        self._take_matches()
+        self._offset += len(chunk)
+
+        # Later matches start at most one term length before the current end
+        dropped = np.searchsorted(self._known, self._offset - self._lookback)
+        self._before_known += int(dropped)
+        self._known = self._known[dropped:]
+
+        if len(self._keys) >= _COMPACT_EVERY:
+            keys, counts = _aggregate(self._keys, self._counts)
+            self._keys, self._counts = [keys], [counts]
+
+    def finish(self) -> Tuple[Dict[str, int], CooccurrenceMatrix]:
+        """
+        Return the term counts and the co-occurrence matrix.
+        """
+        counts = self._scanner.finish()
+        self._take_matches()
+        keys, totals = _aggregate(self._keys, self._counts)
+        return counts, CooccurrenceMatrix.from_keys(self.terms, keys, totals)
+
+    def _take_matches(self) -> None:
+        """
+        Map newly accepted matches to unit numbers and collect their pairs.
+        """
+        matches = self._scanner.matches
+        if not matches:
+            return
+        self._scanner.matches = []
+
+        found = np.array(matches, dtype=np.int64)
+        units = self._before_known + np.searchsorted(self._known, found[:, 1], side="right")
+        self._pair(found[:, 0], units)
+
+    def _pair(self, ids: np.ndarray, units: np.ndarray) -> None:
+        """
+        Collect all pairs of different terms within the window that involve a new match.
+        """
+        all_ids = np.concatenate((self._carry_ids, ids))
+        all_units = np.concatenate((self._carry_units, units))
+        is_new = np.concatenate((np.zeros(len(self._carry_ids), dtype=bool), np.ones(len(ids), dtype=bool)))
+
+        order = np.argsort(all_units, kind="stable")
+        all_ids, all_units, is_new = all_ids[order], all_units[order], is_new[order]
+
+        size = len(self.terms)
+        # In sorted order, once no match is within the window of the match
+        # `offset` places before it, no larger offset can be either
+        for offset in range(1, len(all_units)):
+            close = all_units[offset:] - all_units[:-offset] <= self.window
+            if not close.any():
+                break
+            keep = close & (is_new[offset:] | is_new[:-offset])
+            first, second = all_ids[:-offset][keep], all_ids[offset:][keep]
+            different = first != second
+            first, second = first[different], second[different]
+            if len(first):
+                keys, counts = np.unique(
+                    np.minimum(first, second) * size + np.maximum(first, second),
+                    return_counts=True,
+                )
+                self._keys.append(keys)
+                self._counts.append(counts)
+
+        recent = all_units >= all_units[-1] - self._margin
+        self._carry_ids, self._carry_units = all_ids[recent], all_units[recent]
@@ -0,0 +1,318 @@
+"""
+corpus.py
+
+Corpus mode: count vocabulary terms across a whole directory of research
+documents instead of the single `research.md` file.
+
+Documents are spread across a `concurrent.futures.ProcessPoolExecutor`.
+Every worker counts whole documents with the regular engines from `stats.py`,
+and the per-document counts are merged into one dict with exactly the same
+shape as `usage_stats.json`. Each worker also reports how many documents and
+bytes it processed, so throughput can be compared per worker.
+
+Counts can be cached on disk per document (see `CountCache`), keyed by the
+content hash of the document and the hash of the term list. A run then only
+recounts documents that actually changed and re-aggregates the rest.
+
+Optionally every document is counted together with its term co-occurrences
+(see `cooccurrence.py`), and the per-document matrices are added up.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from automaton import DEFAULT_OVERLAP, TermAutomaton
+from stats import CACHE_DIR, DEFAULT_ENGINE, count_file, count_file_cooccurrence, hash_file
+
+if TYPE_CHECKING:
+    from cooccurrence import CooccurrenceMatrix
+
+
+@dataclass
+class WorkerStats:
+    """
+    Work done by a single worker process.
+    """
+
+    documents: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """
+        Counting throughput of this worker in MB/s.
+        """
+        if self.seconds <= 0:
+            return 0.0
+        return self.bytes / 1e6 / self.seconds
+
+
+@dataclass
+class CorpusResult:
+    """
+    Result of counting a corpus.
+
+    `totals` has the same shape as `usage_stats.json`, `documents` maps a
+    document name to its own counts, and `workers` maps a worker pid to its
+    throughput numbers. `cooccurrence` is set when co-occurrence was counted.
+    """
+
+    totals: Dict[str, int]
+    documents: Dict[str, Dict[str, int]]
+    workers: Dict[int, WorkerStats] = field(default_factory=dict)
+    seconds: float = 0.0
+    cached: int = 0
+    cooccurrence: Optional["CooccurrenceMatrix"] = None
+
+
+def hash_terms(terms: List[str], groups: Optional[List[int]] = None) -> str:
+    """
+    Return the SHA-256 hex digest of a term list (order matters) and its automaton groups.
+    """
+    key = terms if groups is None else [terms, groups]
+    return hashlib.sha256(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class CountCache:
+    """
+    Persistent per-document counts.
+
+    Entries live in `<directory>/<term list hash>/<document hash>.json`, so a
+    changed vocabulary never reuses counts made for another term list, and
+    renaming or moving a document does not invalidate its entry.
+    Only non-zero counts are stored.
+    """
+
+    def __init__(self, directory: Path, terms: List[str], groups: Optional[List[int]] = None) -> None:
+        self.terms = terms
+        self.directory = directory / hash_terms(terms, groups)[:16]
+
+    def _entry(self, document_hash: str) -> Path:
+        return self.directory / f"{document_hash}.json"
+
+    def get(self, document_hash: str) -> Optional[Dict[str, int]]:
+        """
+        Return the cached counts for a document, or None on a miss.
+        """
+        entry = self._entry(document_hash)
+        try:
+            stored = json.loads(entry.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return {term: stored.get(term, 0) for term in self.terms}
+
+    def put(self, document_hash: str, counts: Dict[str, int]) -> None:
+        """
+        Store the counts for a document.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(document_hash)
+        # Write to a temporary file first so readers never see half an entry
+        temporary = entry.with_suffix(f".{os.getpid()}.tmp")
+        temporary.write_text(
+            json.dumps({term: count for term, count in counts.items() if count}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(temporary, entry)
+
+
+def find_documents(directory: Path, pattern: str = "*.md") -> List[Path]:
+    """
+    Return all research documents below `directory`, sorted by path.
+    """
+    return sorted(path for path in directory.rglob(pattern) if path.is_file())
+
+
+# Per-process state, set once by the pool initializer
+_worker_terms: List[str] = []
+_worker_engine: str = DEFAULT_ENGINE
+_worker_cooccurrence: Optional[Tuple[str, Optional[int]]] = None
+_worker_overlap: str = DEFAULT_OVERLAP
+_worker_automaton: Optional[TermAutomaton] = None
+_worker_cache_dir: Optional[Path] = CACHE_DIR
+
+
+def _init_worker(
+    terms: List[str],
+    engine: str,
+    cooccurrence: Optional[Tuple[str, Optional[int]]] = None,
+    overlap: str = DEFAULT_OVERLAP,
+    automaton: Optional[TermAutomaton] = None,
+    cache_dir: Optional[Path] = CACHE_DIR,
+) -> None:
+    """
+    Store the counting settings in a freshly started worker process.
+    """
+    global _worker_terms, _worker_engine, _worker_cooccurrence, _worker_overlap, _worker_automaton
+    global _worker_cache_dir
+    _worker_terms = terms
+    _worker_engine = engine
+    _worker_cooccurrence = cooccurrence
+    _worker_overlap = overlap
+    _worker_automaton = automaton
+    _worker_cache_dir = cache_dir
+
+
+def _count_document(path: Path) -> Tuple[Path, Dict[str, int], int, float, int, Optional["CooccurrenceMatrix"]]:
+    """
+    Count one document inside a worker process.
+
+    Returns the path, its counts, its size in bytes, the time spent, the
+    pid of the worker (so the parent can build throughput statistics) and
+    the co-occurrence matrix of the document, if requested.
+    """
+    started = time.perf_counter()
+    matrix = None
+    if _worker_cooccurrence is None:
+        counts = count_file(
+            path,
+            _worker_terms,
+            engine=_worker_engine,
+            overlap=_worker_overlap,
+            automaton=_worker_automaton,
+            cache_dir=_worker_cache_dir,
+        )
+    else:
+        unit, window = _worker_cooccurrence
+        counts, matrix = count_file_cooccurrence(
+            path,
+            _worker_terms,
+            unit=unit,
+            window=window,
+            overlap=_worker_overlap,
+            automaton=_worker_automaton,
+        )
+    elapsed = time.perf_counter() - started
+    return path, counts, path.stat().st_size, elapsed, os.getpid(), matrix
+
+
+def count_corpus(
+    paths: List[Path],
+    terms: List[str],
+    engine: str = DEFAULT_ENGINE,
+    workers: Optional[int] = None,
+    root: Optional[Path] = None,
+    cache: Optional[CountCache] = None,
+    cooccurrence: Optional[Tuple[str, Optional[int]]] = None,
+    overlap: str = DEFAULT_OVERLAP,
+    automaton: Optional[TermAutomaton] = None,
+    cache_dir: Optional[Path] = CACHE_DIR,
+) -> CorpusResult:
+    """
+    Count vocabulary terms in every document and merge the results.
+
+    `workers` is the number of processes (defaults to the CPU count).
+    With a single worker everything runs in the current process.
+    Document names are made relative to `root` when it is given.
+    With a `cache`, only documents whose content changed are counted again.
+
+    `cooccurrence` is a `(unit, window)` pair (see `cooccurrence.py`). Every
+    document is then counted by the co-occurrence pass, which yields the
+    counts and the matrix together. Matrices are not cached, so cached
+    counts are not used in this mode.
+
+    `overlap` is the overlap policy (see `automaton.OVERLAP_POLICIES`). The
+    `cache` must only hold counts made with the same policy. An `automaton`
+    built for `terms` is handed to every worker instead of compiling one there.
+    The index engines keep their indexes in `cache_dir`.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    all_counts: Dict[Path, Dict[str, int]] = {}
+    hashes: Dict[Path, str] = {}
+    missing = list(paths)
+    if cache is not None and cooccurrence is None:
+        missing = []
+        for path in paths:
+            hashes[path] = hash_file(path)
+            counts = cache.get(hashes[path])
+            if counts is None:
+                missing.append(path)
+            else:
+                all_counts[path] = counts
+
+    if workers <= 1 or len(missing) <= 1:
+        _init_worker(terms, engine, cooccurrence, overlap, automaton, cache_dir)
+        results = [_count_document(path) for path in missing]
+    else:
+        # Several documents per task keep the inter-process overhead small
+        chunksize = max(1, len(missing) // (workers * 4))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(terms, engine, cooccurrence, overlap, automaton, cache_dir),
+        ) as executor:
+            results = list(executor.map(_count_document, missing, chunksize=chunksize))
+
+    worker_stats: Dict[int, WorkerStats] = {}
+    matrices = []
+    for path, counts, size, elapsed, pid, matrix in results:
+        all_counts[path] = counts
+        if cache is not None:
+            cache.put(hashes[path] if path in hashes else hash_file(path), counts)
+        if matrix is not None:
+            matrices.append(matrix)
+
+        worker = worker_stats.setdefault(pid, WorkerStats())
+        worker.documents += 1
+        worker.bytes += size
+        worker.seconds += elapsed
+
+    totals = {term: 0 for term in terms}
+    documents: Dict[str, Dict[str, int]] = {}
+    for path in paths:
+        counts = all_counts[path]
+        name = path.relative_to(root).as_posix() if root else path.as_posix()
+        documents[name] = counts
+        for term, count in counts.items():
+            totals[term] += count
+
+    return CorpusResult(
+        totals=totals,
+        documents=documents,
+        workers=worker_stats,
+        seconds=time.perf_counter() - started,
+        cached=len(paths) - len(missing),
+        cooccurrence=_merge_matrices(matrices) if cooccurrence is not None else None,
+    )
+
+
+def _merge_matrices(matrices: List["CooccurrenceMatrix"]) -> Optional["CooccurrenceMatrix"]:
+    """
+    Add up the co-occurrence matrices of all documents (None without documents).
+    """
+    if not matrices:
+        return None
+    if len(matrices) == 1:
+        return matrices[0]
+    return matrices[0].merge(matrices)
+
+
+def format_throughput(result: CorpusResult) -> List[str]:
+    """
+    Build human-readable throughput lines, one per worker plus a total.
+    """
+    lines = []
+    for pid, worker in sorted(result.workers.items()):
+        lines.append(
+            f"worker {pid}: {worker.documents} documents, "
+            f"{worker.bytes / 1e6:.2f} MB in {worker.seconds:.2f} s "
+            f"({worker.mb_per_second:.2f} MB/s)"
+        )
+
+    total_bytes = sum(worker.bytes for worker in result.workers.values())
+    if result.seconds > 0:
+        lines.append(
+            f"total: {len(result.documents)} documents ({result.cached} from cache), "
+            f"{total_bytes / 1e6:.2f} MB counted in {result.seconds:.2f} s "
+            f"({total_bytes / 1e6 / result.seconds:.2f} MB/s)"
+        )
+    return lines
@@ -7,11 +7,14 @@ This file exists so that the GitHub Actions workflow can call a single
 entry point, but it can also be used locally:
 
     python generate_vocab_graph.py
+    python generate_vocab_graph.py "docs/**/*.md" --engine mmap --workers 8
+
+It accepts the same options as `python stats.py --help`.
 """
 
-from stats import main
+from stats import cli
 
 
 if __name__ == "__main__":
-    # Delegate all work to the main() function in stats.py
-    main()
+    # Delegate all work to the command-line interface in stats.py
+    cli()
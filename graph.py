@@ -0,0 +1,574 @@
+"""
+graph.py
+
+Futuristic vocabulary graph generator used by `stats.py`.
+
+The graph uses:
+- Dark background with a subtle grid
+- Rectangular "cards" instead of circles
+- Glow around nodes
+- Soft, segmented edges
+- Small light particles in the background
+
+This module imports matplotlib, networkx and numpy, so `stats.py` only
+imports it when a graph is actually rendered.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import matplotlib
+# Use a non-interactive backend so the script works in CI / GitHub Actions
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import networkx as nx
+from matplotlib.collections import LineCollection, PolyCollection
+import numpy as np
+
+from profiling import stage
+from stats import CACHE_DIR, DEFAULT_LAYOUT, GRAPH_DPI, OUTPUT_PNG
+
+if TYPE_CHECKING:
+    from cooccurrence import CooccurrenceMatrix
+
+
+def _get_top_terms(freq: Dict[str, int], top_k: int = 3) -> List[str]:
+    """
+    Return a list with the names of the top_k most frequent terms.
+
+    Only terms with a frequency > 0 are considered.
+    """
+    non_zero = [(term, count) for term, count in freq.items() if count > 0]
+    if not non_zero:
+        return []
+
+    # Sort by frequency (descending), then alphabetically for stability
+    non_zero.sort(key=lambda x: (-x[1], x[0]))
+    return [term for term, _ in non_zero[:top_k]]
+
+
+# Spring layout iterations when most positions come from the layout cache
+WARM_LAYOUT_ITERATIONS = 15
+
+
+def _spring_layout(G: nx.Graph, cache_dir: Optional[Path]) -> Dict[str, np.ndarray]:
+    """
+    Compute node positions, warm-started from the previous run.
+
+    Positions are cached in `layout.json` inside the cache directory, keyed
+    by node label together with the node frequency. Nodes whose frequency is
+    unchanged keep their position (they are passed as `fixed`), so only new
+    or changed nodes move and far fewer iterations are needed. This also
+    keeps the picture stable between CI commits. Moved nodes are kept inside
+    the [-1, 1] square of a cold layout.
+    Without a `cache_dir` the layout is computed from scratch.
+    """
+    if cache_dir is None:
+        return nx.spring_layout(G, seed=42, k=1.2)
+
+    cache_path = cache_dir / "layout.json"
+    try:
+        cached = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cached = {}
+
+    initial: Dict[str, np.ndarray] = {}
+    fixed: List[str] = []
+    for node, node_data in G.nodes(data=True):
+        entry = cached.get(node)
+        if entry is None:
+            continue
+        initial[node] = np.array(entry["pos"], dtype=float)
+        if entry["freq"] == node_data.get("freq", 0):
+            fixed.append(node)
+
+    if len(fixed) == len(G):
+        # Nothing changed: reuse the cached layout as is
+        pos = initial
+    elif initial:
+        pos = nx.spring_layout(
+            G,
+            k=1.2,
+            pos=initial,
+            fixed=fixed or None,
+            iterations=WARM_LAYOUT_ITERATIONS,
+            seed=42,
+        )
+        # With `fixed` nodes networkx does not rescale the result, so moved
+        # nodes can leave the [-1, 1] square that the figure shows. Pull them
+        # back towards the center before they are cached and drift further.
+        moved = [node for node in G if node not in fixed]
+        extent = max(float(np.abs(pos[node]).max()) for node in moved)
+        if extent > 1:
+            for node in moved:
+                pos[node] = pos[node] / extent
+    else:
+        pos = nx.spring_layout(G, seed=42, k=1.2)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(
+        json.dumps(
+            {
+                node: {"pos": [float(value) for value in pos[node]], "freq": node_data.get("freq", 0)}
+                for node, node_data in G.nodes(data=True)
+            },
+            indent=4,
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    return pos
+
+
+# Number of extra nodes each further ring of the radial layout can hold
+RADIAL_RING_GROWTH = 8
+
+
+def _radial_layout(G: nx.Graph, cache_dir: Optional[Path] = None) -> Dict[str, np.ndarray]:
+    """
+    Place terms on concentric rings around the center node.
+
+    The vocabulary graph is always a star, so no force simulation is needed.
+    Terms are sorted by frequency (then alphabetically); the top-3 terms form
+    the innermost ring and every further ring holds RADIAL_RING_GROWTH more
+    terms than the previous one. Apart from that sort, everything is a
+    handful of vectorized NumPy operations, so 10k+ terms are placed
+    instantly, and the result is fully deterministic. Nothing is cached,
+    so `cache_dir` is unused.
+    """
+    center = [node for node, data in G.nodes(data=True) if data.get("role") == "center"]
+    terms = sorted(
+        (node for node in G if node not in center),
+        key=lambda node: (-G.nodes[node].get("freq", 0), node),
+    )
+    pos = {node: np.zeros(2) for node in center}
+    if not terms:
+        return pos
+
+    # Ring capacities: top-3 first, then 8, 16, 24, ... terms
+    capacities = [min(3, len(terms))]
+    while sum(capacities) < len(terms):
+        capacities.append(RADIAL_RING_GROWTH * len(capacities))
+    capacities[-1] -= sum(capacities) - len(terms)
+    capacities = np.array(capacities)
+
+    ring = np.repeat(np.arange(len(capacities)), capacities)
+    first_in_ring = np.concatenate(([0], np.cumsum(capacities)[:-1]))
+    slot = np.arange(len(terms)) - first_in_ring[ring]
+
+    # Every other ring is rotated by half a step so neighbours do not line up
+    angle = 2 * np.pi * (slot + 0.5 * (ring % 2)) / capacities[ring]
+    # The outermost ring has radius 1, like the spring layout
+    radius = (ring + 1) / len(capacities)
+
+    xy = np.stack([radius * np.cos(angle), radius * np.sin(angle)], axis=1)
+    pos.update(zip(terms, xy))
+    return pos
+
+
+# Available graph layouts; each takes the graph and the cache directory
+LAYOUTS = {
+    "spring": _spring_layout,
+    "radial": _radial_layout,
+}
+
+
+# Number of points used to split every edge into short segments
+EDGE_STEPS = 40
+
+# Strongest co-occurrence pairs drawn as term-term edges
+COOCCURRENCE_EDGES = 60
+
+
+def _draw_edges(ax, G: nx.Graph, pos: Dict[str, np.ndarray]) -> None:
+    """
+    Draw all edges to the center node as one LineCollection.
+
+    Every edge is split into EDGE_STEPS - 1 short segments whose alpha grows
+    slightly along the edge, which imitates a soft gradient / neon line.
+    All segments and their RGBA colors are computed as NumPy arrays and
+    drawn with a single artist instead of one Line2D per segment.
+    """
+    edges = [(u, v) for u, v, data in G.edges(data=True) if data.get("role") != "cooccurrence"]
+    if not edges:
+        return
+
+    # Shape (edges, 2, 2): start and end point of every edge
+    ends = np.array([[pos[u], pos[v]] for u, v in edges], dtype=float)
+
+    # Interpolate points between the two nodes: shape (edges, steps, 2)
+    ramp = np.linspace(0.0, 1.0, EDGE_STEPS)
+    points = ends[:, :1, :] + (ends[:, 1:, :] - ends[:, :1, :]) * ramp[None, :, None]
+
+    # Consecutive point pairs become segments: shape (edges * (steps - 1), 2, 2)
+    segments = np.stack([points[:, :-1, :], points[:, 1:, :]], axis=2).reshape(-1, 2, 2)
+
+    # Alpha grows slightly along the edge
+    alpha = 0.15 + (np.arange(EDGE_STEPS - 1) / EDGE_STEPS) ** 1.5 * 0.5
+    colors = np.empty((EDGE_STEPS - 1, 4))
+    colors[:, :3] = (0.2, 0.8, 1.0)
+    colors[:, 3] = alpha
+    colors = np.tile(colors, (len(edges), 1))
+
+    ax.add_collection(
+        LineCollection(
+            segments,
+            colors=colors,
+            linewidths=1.6,
+            capstyle="projecting",
+            # Same drawing order as plain plt.plot lines
+            zorder=2,
+        )
+    )
+
+
+def _draw_cooccurrence_edges(ax, G: nx.Graph, pos: Dict[str, np.ndarray]) -> None:
+    """
+    Draw the term-term co-occurrence edges as one LineCollection.
+
+    Width and opacity grow with the co-occurrence count, relative to the
+    strongest pair.
+    """
+    edges = [(u, v, data["weight"]) for u, v, data in G.edges(data=True) if data.get("role") == "cooccurrence"]
+    if not edges:
+        return
+
+    segments = np.array([[pos[u], pos[v]] for u, v, _ in edges], dtype=float)
+    weights = np.array([weight for _, _, weight in edges], dtype=float)
+    strength = weights / weights.max()
+
+    colors = np.empty((len(edges), 4))
+    colors[:, :3] = (1.0, 0.45, 0.85)
+    colors[:, 3] = 0.12 + 0.5 * strength
+
+    ax.add_collection(
+        LineCollection(
+            segments,
+            colors=colors,
+            linewidths=0.6 + 3.0 * strength,
+            # Below the edges to the center node
+            zorder=1.5,
+        )
+    )
+
+
+# Convert node "size" to rectangle width/height in layout coordinates.
+# Denominators are tuned so labels fit comfortably inside.
+CARD_WIDTH_DIVISOR = 8000.0    # wider rectangles
+CARD_HEIGHT_DIVISOR = 22000.0  # slightly taller rectangles
+
+# Color scheme per node role: (face color, glow color).
+# All faces are relatively light so black text is readable.
+CARD_COLORS = {
+    "center": ("#ffe89c", "#fff7c7"),  # light yellow
+    "top": ("#ffd1d9", "#ffe4ea"),     # light pink
+    "normal": ("#d6ecff", "#e6f4ff"),  # light blue
+}
+
+
+def _rectangles(x: np.ndarray, y: np.ndarray, width: np.ndarray, height: np.ndarray) -> np.ndarray:
+    """
+    Return the corner vertices of centered rectangles, shape (n, 4, 2).
+    """
+    left, right = x - width / 2, x + width / 2
+    bottom, top = y - height / 2, y + height / 2
+    return np.stack(
+        [
+            np.stack([left, bottom], axis=1),
+            np.stack([right, bottom], axis=1),
+            np.stack([right, top], axis=1),
+            np.stack([left, top], axis=1),
+        ],
+        axis=1,
+    )
+
+
+def _draw_cards(ax, nodes: List[Tuple[str, Dict]], pos: Dict[str, np.ndarray]) -> None:
+    """
+    Draw the glow layers and the cards of all nodes as three collections.
+
+    Positions, sizes and colors are gathered into arrays first, and each
+    layer (outer glow, inner glow, card) becomes one PolyCollection,
+    the vertex-array form of a PatchCollection of rectangles.
+    """
+    xy = np.array([pos[node] for node, _ in nodes], dtype=float)
+    sizes = np.array([data.get("size", 1800) for _, data in nodes], dtype=float)
+    roles = [data.get("role", "normal") for _, data in nodes]
+    face_colors = [CARD_COLORS.get(role, CARD_COLORS["normal"])[0] for role in roles]
+    glow_colors = [CARD_COLORS.get(role, CARD_COLORS["normal"])[1] for role in roles]
+
+    x, y = xy[:, 0], xy[:, 1]
+    width = sizes / CARD_WIDTH_DIVISOR
+    height = sizes / CARD_HEIGHT_DIVISOR
+
+    # (margin around the card, alpha) of the two glow layers, outermost first
+    for margin, alpha in ((0.012, 0.18), (0.006, 0.35)):
+        ax.add_collection(
+            PolyCollection(
+                _rectangles(x, y, width + 2 * margin, height + 2 * margin),
+                facecolors=glow_colors,
+                edgecolors="none",
+                alpha=alpha,
+            )
+        )
+
+    # Main rectangle for the node itself
+    ax.add_collection(
+        PolyCollection(
+            _rectangles(x, y, width, height),
+            facecolors=face_colors,
+            edgecolors="white",
+            linewidths=1.8,
+            joinstyle="miter",
+            alpha=0.96,
+        )
+    )
+
+
+# Seed for the background particles, so the same input renders the same PNG
+PARTICLE_SEED = 42
+
+# Bump whenever the drawing code changes the picture
+RENDER_VERSION = 1
+
+
+def graph_fingerprint(
+    freq: Dict[str, int],
+    layout: str = DEFAULT_LAYOUT,
+    dpi: int = GRAPH_DPI,
+    cooccurrence_edges: Optional[List[Tuple[str, str, int]]] = None,
+) -> str:
+    """
+    Return a hash of everything that determines the rendered graph.
+
+    Covers the frequency dict, the layout, the co-occurrence edges, the
+    style parameters and the versions of the plotting libraries.
+    """
+    payload = {
+        "freq": freq,
+        "layout": layout,
+        "cooccurrence": [list(edge) for edge in cooccurrence_edges or []],
+        "style": {
+            "render_version": RENDER_VERSION,
+            "dpi": dpi,
+            "particle_seed": PARTICLE_SEED,
+            "edge_steps": EDGE_STEPS,
+            "cooccurrence_edges": COOCCURRENCE_EDGES,
+            "card_size": [CARD_WIDTH_DIVISOR, CARD_HEIGHT_DIVISOR],
+            "card_colors": CARD_COLORS,
+        },
+        "versions": {
+            "matplotlib": matplotlib.__version__,
+            "networkx": nx.__version__,
+            "numpy": np.__version__,
+        },
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _stored_fingerprint(path: Path) -> Optional[str]:
+    """
+    Read the fingerprint saved in the metadata of an existing PNG, if any.
+    """
+    # Pillow is always installed together with matplotlib
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            return image.text.get("Fingerprint")
+    except (OSError, AttributeError):
+        return None
+
+
+def _save_figure(output: Path, fingerprint: str, dpi: int) -> None:
+    """
+    Save the current figure with its fingerprint stored in the PNG metadata.
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    plt.savefig(
+        output,
+        dpi=dpi,
+        bbox_inches="tight",
+        metadata={"Fingerprint": fingerprint},
+    )
+    plt.close()
+
+
+def _draw_graph(G: nx.Graph, pos: Dict[str, np.ndarray], center_label: str) -> None:
+    """
+    Create the figure and all artists of the vocabulary graph.
+    """
+    # --- Prepare the figure and background ---
+    plt.figure(figsize=(20, 16))
+    ax = plt.gca()
+    plt.axis("off")
+
+    # Dark background color
+    ax.set_facecolor("#030510")
+
+    # Subtle grid lines for a "tech" feeling
+    for x in np.linspace(-1, 1, 30):
+        ax.axvline(x, color="#0a1028", linewidth=0.4, alpha=0.35)
+    for y in np.linspace(-1, 1, 30):
+        ax.axhline(y, color="#0a1028", linewidth=0.4, alpha=0.35)
+
+    # --- Background light particles (small glowing dots) ---
+    rng = np.random.default_rng(PARTICLE_SEED)
+    particles_x = rng.uniform(-1, 1, 140)
+    particles_y = rng.uniform(-1, 1, 140)
+    plt.scatter(
+        particles_x,
+        particles_y,
+        s=12,
+        color="#3fd0ff",
+        alpha=0.18,
+    )
+
+    # --- Weighted term-term co-occurrence edges ---
+    _draw_cooccurrence_edges(ax, G, pos)
+
+    # --- Segmented edges (imitating a gradient / neon line) ---
+    _draw_edges(ax, G, pos)
+
+    # --- Draw rectangular nodes with glow ---
+    nodes = list(G.nodes(data=True))
+    _draw_cards(ax, nodes, pos)
+
+    for node, node_data in nodes:
+        x, y = pos[node]
+        rect_height = node_data.get("size", 1800) / CARD_HEIGHT_DIVISOR
+
+        # Node label in the center of the rectangle
+        # All labels are black so they stand out on a light face color.
+        plt.text(
+            x,
+            y,
+            node,
+            ha="center",
+            va="center",
+            fontsize=10,
+            fontweight="bold",
+            color="black",
+        )
+
+        # Frequency value displayed slightly below the node (not for the center)
+        if node != center_label:
+            plt.text(
+                x,
+                y - rect_height * 0.9,
+                f"{node_data.get('freq', 0)}",
+                fontsize=8,
+                color="#4a6b86",
+                ha="center",
+                va="center",
+            )
+
+    # Title explaining what the viewer is looking at
+    plt.title(
+        "Generative AI Vocabulary — Futuristic Graph",
+        fontsize=20,
+        color="white",
+        pad=20,
+    )
+
+
+def build_graph(
+    freq: Dict[str, int],
+    layout: str = DEFAULT_LAYOUT,
+    output: Path = OUTPUT_PNG,
+    cache_dir: Optional[Path] = CACHE_DIR,
+    dpi: int = GRAPH_DPI,
+    cooccurrence: Optional["CooccurrenceMatrix"] = None,
+) -> None:
+    """
+    Build and save a vocabulary graph.
+
+    `layout` is either "spring" (force-directed, cached between runs) or
+    "radial" (terms on concentric rings sorted by frequency, see LAYOUTS).
+
+    Nodes:
+        - Center node: "Generative AI Applications"
+        - One node per vocabulary term that appears at least once in research.md
+
+    Edges:
+        - Every term is linked to the center node
+        - With a `cooccurrence` matrix, the COOCCURRENCE_EDGES strongest term
+          pairs are linked as well (width and opacity follow the count)
+
+    Visual style:
+        - Dark grid background
+        - Rectangular nodes (cards) instead of circles
+        - Glow around nodes
+        - Segmented edges to imitate a soft gradient
+        - Light particles scattered in the background
+        - Top-3 most frequent terms are highlighted in a separate color
+
+    Output is saved to `output` (`vocab_graph.png` by default); the spring
+    layout keeps its position cache in `cache_dir`; `dpi` sets the resolution.
+    Rendering is deterministic, and it is skipped entirely when the
+    fingerprint stored in the existing PNG matches the current input (see
+    `graph_fingerprint`).
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown graph layout: {layout!r}")
+
+    cooccurrence_edges = cooccurrence.top_pairs(COOCCURRENCE_EDGES) if cooccurrence is not None else []
+    fingerprint = graph_fingerprint(freq, layout, dpi, cooccurrence_edges)
+    if _stored_fingerprint(output) == fingerprint:
+        return
+
+    # Keep only terms that actually appear in the research text
+    used_terms = {term: count for term, count in freq.items() if count > 0}
+
+    # If nothing is used, create a simple message image and stop
+    if not used_terms:
+        plt.figure(figsize=(10, 6))
+        ax = plt.gca()
+        ax.set_facecolor("#030510")
+        plt.text(
+            0.5,
+            0.5,
+            "No vocabulary terms found in research.md",
+            ha="center",
+            va="center",
+            fontsize=12,
+            color="white",
+        )
+        plt.axis("off")
+        _save_figure(output, fingerprint, dpi)
+        return
+
+    center_label = "Generative AI Applications"
+    top_terms = set(_get_top_terms(freq, top_k=3))
+
+    # --- Create the graph structure ---
+    G = nx.Graph()
+    G.add_node(center_label, role="center", freq=0, size=3200)
+
+    for term, count in used_terms.items():
+        G.add_node(
+            term,
+            role="top" if term in top_terms else "normal",
+            freq=count,
+            size=1800 + count * 400,
+        )
+        G.add_edge(center_label, term, weight=count)
+
+    for first, second, count in cooccurrence_edges:
+        if first in used_terms and second in used_terms:
+            G.add_edge(first, second, weight=count, role="cooccurrence")
+
+    # Spring layout gives a natural "network" shape;
+    # the radial layout is instant even for very large vocabularies
+    with stage("layout"):
+        pos = LAYOUTS[layout](G, cache_dir)
+
+    with stage("artists"):
+        _draw_graph(G, pos, center_label)
+
+    with stage("savefig"):
+        _save_figure(output, fingerprint, dpi)
@@ -0,0 +1,159 @@
+"""
+inverted_index.py
+
+Positional inverted index over a research document.
+
+The lowercased text is split once into alternating "slots":
+
+    gap, token, gap, token, ..., token, gap
+
+where tokens are runs of word characters (`\\w+`) and gaps are everything in
+between (the first and last gap may be empty). The index stores, for every
+distinct slot string, the sorted list of slot positions where it occurs.
+
+A vocabulary term is split the same way. A multi-word term such as
+"large language model" then becomes a short slot pattern
+
+    "large", " ", "language", " ", "model"
+
+and is answered by intersecting the position lists instead of rescanning the
+text. Because gaps are stored as well, the answer is exactly the same as the
+`\\b`-delimited regex used by `stats.count_frequencies`.
+"""
+
+import bisect
+import os
+import pickle
+import re
+from array import array
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+_SLOT_SPLIT = re.compile(r"(\w+)")
+
+# Bump when the on-disk format changes
+INDEX_VERSION = 1
+
+
+def split_slots(text_lower: str) -> List[str]:
+    """
+    Split text into alternating gap / token slots (gaps at even positions).
+    """
+    return _SLOT_SPLIT.split(text_lower)
+
+
+def term_pattern(term: str) -> Tuple[List[str], bool, bool]:
+    """
+    Turn a term into the slot pattern it must match.
+
+    Returns the pattern, whether it starts with a gap and whether it ends
+    with a gap. A leading or trailing gap must be preceded / followed by a
+    token in the text, which is what `\\b` requires next to a non-word char.
+    """
+    pieces = split_slots(term)
+    if len(pieces) == 1:
+        # No word characters at all: the whole term is a single gap
+        return pieces, True, True
+
+    leading, trailing = pieces[0], pieces[-1]
+    pattern = pieces[1:-1]
+    if leading:
+        pattern.insert(0, leading)
+    if trailing:
+        pattern.append(trailing)
+    return pattern, bool(leading), bool(trailing)
+
+
+class PositionalIndex:
+    """
+    Slot string -> sorted slot positions, built from one lowercased text.
+    """
+
+    def __init__(self, postings: Dict[str, array], size: int) -> None:
+        self.postings = postings
+        self.size = size
+
+    @classmethod
+    def build(cls, text_lower: str) -> "PositionalIndex":
+        """
+        Tokenize the text once and collect the postings of every slot.
+        """
+        postings: Dict[str, array] = {}
+        slots = split_slots(text_lower)
+        for position, slot in enumerate(slots):
+            positions = postings.get(slot)
+            if positions is None:
+                positions = postings[slot] = array("I")
+            positions.append(position)
+        return cls(postings, len(slots))
+
+    def _contains(self, slot: str, position: int) -> bool:
+        """
+        Return True if `slot` occurs at `position`.
+        """
+        positions = self.postings.get(slot)
+        if positions is None:
+            return False
+        found = bisect.bisect_left(positions, position)
+        return found < len(positions) and positions[found] == position
+
+    def count(self, term: str) -> int:
+        """
+        Count non-overlapping occurrences of one lowercased term.
+        """
+        if not term:
+            return 0
+        pattern, starts_with_gap, ends_with_gap = term_pattern(term)
+        if any(slot not in self.postings for slot in pattern):
+            return 0
+
+        # Walk the rarest slot of the pattern and check the others around it
+        anchor = min(range(len(pattern)), key=lambda j: len(self.postings[pattern[j]]))
+        others = [j for j in range(len(pattern)) if j != anchor]
+        # Gaps sit at even slot positions, tokens at odd ones
+        parity = 0 if starts_with_gap else 1
+        last_slot = self.size - 1
+
+        count = 0
+        last_end = 0
+        for position in self.postings[pattern[anchor]]:
+            start = position - anchor
+            end = start + len(pattern)
+            if start < last_end or start % 2 != parity:
+                continue
+            if starts_with_gap and start == 0:
+                continue
+            if ends_with_gap and end - 1 == last_slot:
+                continue
+            if all(self._contains(pattern[j], start + j) for j in others):
+                count += 1
+                last_end = end
+        return count
+
+    def count_terms(self, terms: List[str]) -> Dict[str, int]:
+        """
+        Count every term of the vocabulary.
+        """
+        return {term: self.count(term) for term in terms}
+
+    def save(self, path: Path) -> None:
+        """
+        Write the index to disk.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see half an index
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        with temporary.open("wb") as handle:
+            pickle.dump((INDEX_VERSION, self.size, self.postings), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "PositionalIndex":
+        """
+        Read an index written by `save`.
+        """
+        with path.open("rb") as handle:
+            version, size, postings = pickle.load(handle)
+        if version != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {version} in {path}")
+        return cls(postings, size)
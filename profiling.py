@@ -0,0 +1,214 @@
+"""
+profiling.py
+
+Stage-level timing and memory instrumentation for the pipeline.
+
+The pipeline marks its stages with `stage(name)`:
+
+    load_vocabulary (or parse_vocabulary and compile_vocabulary when the
+    vocabulary artifact is missing), load_text, count, write_json,
+    write_matrix, graph (and inside graph: import_graph, layout, artists,
+    savefig)
+
+Stages may be nested. While no recorder is active `stage` does nothing, so
+the instrumentation costs practically nothing in normal runs. After
+`start_profiling()` every stage records its wall time, CPU time and the
+tracemalloc peak above the memory in use when the stage started (Python
+allocations only; memory of C extensions is not traced). The recorder
+writes a JSON report (every stage plus a per-name summary) and, optionally,
+a Chrome trace-event file that can be opened in `chrome://tracing` or
+https://ui.perfetto.dev.
+
+Only stages of the current process are recorded; work done in corpus-mode
+worker processes shows up as part of the parent's `count` stage.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+
+@dataclass
+class StageRecord:
+    """
+    One finished stage.
+    """
+
+    name: str
+    start_seconds: float
+    wall_seconds: float
+    cpu_seconds: float
+    peak_memory_bytes: Optional[int]
+    depth: int
+    thread: int
+
+
+class StageRecorder:
+    """
+    Collects a `StageRecord` for every stage that finishes while it is active.
+    """
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        self.trace_memory = trace_memory
+        self.records: List[StageRecord] = []
+        self._origin = time.perf_counter()
+        # Open stages: [highest absolute tracemalloc peak seen by nested stages]
+        self._open: List[List[int]] = []
+        self._started_tracing = False
+
+    def start(self) -> None:
+        """
+        Start tracing memory (if requested and not already traced).
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """
+        Stop tracing memory if this recorder started it.
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """
+        Record one stage around the body of the `with` block.
+        """
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        current = 0
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the parent's peak so far before resetting it for this stage
+            if self._open:
+                self._open[-1][0] = max(self._open[-1][0], peak)
+            tracemalloc.reset_peak()
+
+        self._open.append([0])
+        started_wall = time.perf_counter()
+        started_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - started_wall
+            cpu = time.process_time() - started_cpu
+            nested_peak = self._open.pop()[0]
+
+            peak_memory = None
+            if tracing and tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1], nested_peak)
+                peak_memory = max(0, peak - current)
+                if self._open:
+                    self._open[-1][0] = max(self._open[-1][0], peak)
+
+            self.records.append(
+                StageRecord(
+                    name=name,
+                    start_seconds=started_wall - self._origin,
+                    wall_seconds=wall,
+                    cpu_seconds=cpu,
+                    peak_memory_bytes=peak_memory,
+                    depth=len(self._open),
+                    thread=threading.get_ident(),
+                )
+            )
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Totals per stage name, in the order the stages first finished.
+        """
+        totals: Dict[str, Dict] = {}
+        for record in self.records:
+            entry = totals.setdefault(
+                record.name,
+                {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_memory_bytes": None},
+            )
+            entry["calls"] += 1
+            entry["wall_seconds"] += record.wall_seconds
+            entry["cpu_seconds"] += record.cpu_seconds
+            if record.peak_memory_bytes is not None:
+                entry["peak_memory_bytes"] = max(entry["peak_memory_bytes"] or 0, record.peak_memory_bytes)
+        return totals
+
+    def write_report(self, path: Path) -> None:
+        """
+        Write every stage and the per-name summary as JSON.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "summary": self.summary(),
+            "stages": [asdict(record) for record in sorted(self.records, key=lambda r: r.start_seconds)],
+        }
+        path.write_text(json.dumps(report, indent=4), encoding="utf-8")
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """
+        Write the stages in the Chrome trace-event format ("complete" events).
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        events = [
+            {
+                "name": record.name,
+                "cat": "stage",
+                "ph": "X",
+                "ts": record.start_seconds * 1e6,
+                "dur": record.wall_seconds * 1e6,
+                "pid": pid,
+                "tid": record.thread,
+                "args": {
+                    "cpu_ms": record.cpu_seconds * 1e3,
+                    "peak_memory_bytes": record.peak_memory_bytes,
+                },
+            }
+            for record in self.records
+        ]
+        path.write_text(
+            json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}),
+            encoding="utf-8",
+        )
+
+
+# Recorder of the current process, None while profiling is off
+_recorder: Optional[StageRecorder] = None
+
+
+def start_profiling(trace_memory: bool = True) -> StageRecorder:
+    """
+    Start recording stages in this process and return the recorder.
+    """
+    global _recorder
+    _recorder = StageRecorder(trace_memory=trace_memory)
+    _recorder.start()
+    return _recorder
+
+
+def stop_profiling() -> Optional[StageRecorder]:
+    """
+    Stop recording stages and return the recorder (None if none was active).
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.stop()
+    return recorder
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Mark a pipeline stage; recorded only while profiling is active.
+    """
+    if _recorder is None:
+        yield
+    else:
+        with _recorder.measure(name):
+            yield
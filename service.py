@@ -0,0 +1,322 @@
+"""
+service.py
+
+Local HTTP analysis service with a resident compiled vocabulary.
+
+Other tools can count terms without paying for process startup and matcher
+compilation on every call. The vocabulary is parsed and compiled once, kept
+in memory, and compiled again only when `vocabulary.md` changes on disk.
+
+    python service.py --port 8000
+
+Endpoints:
+
+    POST /count   count the terms in the request body (UTF-8 text, or JSON
+                  `{"text": ...}`) and return the counts as JSON
+    GET  /stats   counts for the research file (recomputed only when the
+                  research file or the vocabulary changed)
+    GET  /graph   the rendered vocabulary graph as PNG
+
+Malformed requests get a 400 and clients that do not send the whole request
+within `READ_TIMEOUT_SECONDS` a 408.
+
+The server uses only `asyncio` from the standard library. Counting runs in a
+thread pool so that the event loop keeps accepting requests meanwhile;
+rendering is serialized because pyplot is not thread-safe.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from stats import (
+    CACHE_DIR,
+    DEFAULT_LAYOUT,
+    GRAPH_DPI,
+    OUTPUT_PNG,
+    RESEARCH_FILE,
+    VOCAB_FILE,
+    build_graph,
+    load_text,
+)
+from vocabulary import CompiledVocabulary, parse_vocabulary
+from watch import Signature, file_signature
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# Largest accepted request body
+MAX_BODY_BYTES = 64 << 20
+
+# Time a client has to send the whole request before it gets a 408
+READ_TIMEOUT_SECONDS = 30.0
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """
+    Error that is sent back to the client with the given status code.
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisService:
+    """
+    Resident vocabulary plus the request handlers.
+    """
+
+    def __init__(
+        self,
+        vocab: Path = VOCAB_FILE,
+        research: Path = RESEARCH_FILE,
+        output_png: Path = OUTPUT_PNG,
+        cache_dir: Optional[Path] = CACHE_DIR,
+        layout: str = DEFAULT_LAYOUT,
+        dpi: int = GRAPH_DPI,
+        workers: Optional[int] = None,
+        read_timeout: float = READ_TIMEOUT_SECONDS,
+    ) -> None:
+        self.vocab = vocab
+        self.research = research
+        self.output_png = output_png
+        self.cache_dir = cache_dir
+        self.layout = layout
+        self.dpi = dpi
+        self.read_timeout = read_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+        self.vocabulary: Optional[CompiledVocabulary] = None
+        self._vocab_signature: Signature = None
+        self._reload_lock = asyncio.Lock()
+        self._render_lock = asyncio.Lock()
+        # (vocabulary signature, research signature) -> counts of the research file
+        self._stats: Optional[Tuple[Tuple[Signature, Signature], Dict[str, int]]] = None
+
+    def _compile(self) -> CompiledVocabulary:
+        """
+        Parse and compile the vocabulary file.
+        """
+        return CompiledVocabulary.from_entries(parse_vocabulary(load_text(self.vocab)))
+
+    async def _run(self, function, *args):
+        """
+        Run a blocking call in the thread pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def current_vocabulary(self) -> CompiledVocabulary:
+        """
+        Return the compiled vocabulary, compiling it again if the file changed.
+        """
+        signature = file_signature(self.vocab)
+        if self.vocabulary is not None and (signature is None or signature == self._vocab_signature):
+            # A missing file is being replaced by an editor: keep the old vocabulary
+            return self.vocabulary
+
+        async with self._reload_lock:
+            # Another request may have reloaded it while this one was waiting
+            if self.vocabulary is None or signature != self._vocab_signature:
+                vocabulary = await self._run(self._compile)
+                self.vocabulary, self._vocab_signature = vocabulary, signature
+        return self.vocabulary
+
+    async def count(self, text: str) -> Dict[str, int]:
+        """
+        Count every term in one text.
+        """
+        vocabulary = await self.current_vocabulary()
+        return await self._run(vocabulary.count, text)
+
+    async def research_stats(self) -> Dict[str, int]:
+        """
+        Return the counts for the research file, recounting only after a change.
+        """
+        vocabulary = await self.current_vocabulary()
+        key = (self._vocab_signature, file_signature(self.research))
+        if key[1] is None:
+            raise HTTPError(404, f"{self.research} does not exist")
+        if self._stats is None or self._stats[0] != key:
+            text = await self._run(load_text, self.research)
+            self._stats = (key, await self._run(vocabulary.count, text))
+        return self._stats[1]
+
+    async def graph(self) -> bytes:
+        """
+        Return the PNG of the current research stats (rendered only when they changed).
+        """
+        freq = await self.research_stats()
+        async with self._render_lock:
+            await self._run(self._render, freq)
+            return await self._run(self.output_png.read_bytes)
+
+    def _render(self, freq: Dict[str, int]) -> None:
+        """
+        Render the graph (skipped by `graph.build_graph` when the PNG is up to date).
+        """
+        build_graph(freq, layout=self.layout, output=self.output_png, cache_dir=self.cache_dir, dpi=self.dpi)
+
+    async def dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[str, bytes]:
+        """
+        Route one request; returns the content type and the response body.
+        """
+        path = path.split("?", 1)[0]
+        if path == "/count":
+            if method != "POST":
+                raise HTTPError(405, "use POST /count")
+            try:
+                text = body.decode("utf-8")
+                if headers.get("content-type", "").startswith("application/json"):
+                    text = json.loads(text)["text"]
+            except (UnicodeDecodeError, ValueError, KeyError, TypeError):
+                raise HTTPError(400, 'expected UTF-8 text or JSON {"text": ...}')
+            if not isinstance(text, str):
+                raise HTTPError(400, '"text" must be a string')
+            return _json(await self.count(text))
+        if path == "/stats":
+            if method != "GET":
+                raise HTTPError(405, "use GET /stats")
+            return _json(await self.research_stats())
+        if path == "/graph":
+            if method != "GET":
+                raise HTTPError(405, "use GET /graph")
+            return "image/png", await self.graph()
+        raise HTTPError(404, f"unknown path {path}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve one connection (one request, then the connection is closed).
+        """
+        try:
+            try:
+                try:
+                    request = await asyncio.wait_for(_read_request(reader), self.read_timeout)
+                except asyncio.TimeoutError:
+                    raise HTTPError(408, f"request not received within {self.read_timeout:g} seconds")
+                method, path, headers, body = request
+                content_type, payload = await self.dispatch(method, path, headers, body)
+                status = 200
+            except HTTPError as error:
+                status, (content_type, payload) = error.status, _json({"error": str(error)})
+            except Exception as error:
+                status, (content_type, payload) = 500, _json({"error": repr(error)})
+
+            writer.write(
+                (
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode("ascii")
+                + payload
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        """
+        Compile the vocabulary and serve requests until cancelled.
+        """
+        await self.current_vocabulary()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{port} ({len(self.vocabulary.terms)} terms)")
+        async with server:
+            await server.serve_forever()
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+    """
+    Read the request line, the headers and the body of one HTTP request.
+    """
+    try:
+        request_line = (await _read_line(reader)).split()
+        method, path = request_line[0], request_line[1]
+    except IndexError:
+        raise HTTPError(400, "malformed request line")
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = (await _read_line(reader)).strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+    try:
+        body = await reader.readexactly(length) if length > 0 else b""
+    except asyncio.IncompleteReadError as error:
+        raise HTTPError(400, f"body shorter than Content-Length ({len(error.partial)} of {length} bytes)")
+    return method.upper(), path, headers, body
+
+
+async def _read_line(reader: asyncio.StreamReader) -> str:
+    """
+    Read one line of the request head.
+    """
+    try:
+        return (await reader.readline()).decode("latin-1")
+    except (asyncio.LimitOverrunError, ValueError):
+        # `readline` reports a line over the stream limit as a ValueError
+        raise HTTPError(400, "request line or header too long")
+
+
+def _json(data) -> Tuple[str, bytes]:
+    """
+    Encode a JSON response.
+    """
+    return "application/json; charset=utf-8", json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def main() -> None:
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Serve vocabulary term counts over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--vocab", type=Path, default=VOCAB_FILE, help="vocabulary markdown file")
+    parser.add_argument("--research", type=Path, default=RESEARCH_FILE, help="research file for /stats and /graph")
+    parser.add_argument("--output-png", type=Path, default=OUTPUT_PNG, help="where /graph renders the graph")
+    parser.add_argument("--workers", type=int, default=None, help="counting threads (default: CPU count)")
+    args = parser.parse_args()
+
+    service = AnalysisService(
+        vocab=args.vocab,
+        research=args.research,
+        output_png=args.output_png,
+        workers=args.workers,
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,33 +3,40 @@ stats.py
 
 This script analyzes the research text and the vocabulary list in order to:
 
-1. Extract vocabulary terms from `vocabulary.md`
+1. Parse the vocabulary terms and their aliases from `vocabulary.md`
 2. Count how many times each term appears in `research.md`
 3. Save the statistics into `usage_stats.json`
-4. Build a vocabulary graph in `vocab_graph.png`
+4. Build a vocabulary graph in `vocab_graph.png` (drawn by `graph.py`)
 
-The graph uses:
-- Dark background with a subtle grid
-- Rectangular "cards" instead of circles
-- Glow around nodes
-- Soft, segmented edges
-- Small light particles in the background
+The plotting stack is imported only when the graph is rendered, so
+counting (and `python stats.py --stats-only`) stays fast to start.
 
 The goal is to make the visualization both informative and visually attractive.
 """
 
+import argparse
+import glob
+import hashlib
 import json
+import mmap
+import pickle
 import re
+import zipfile
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict
-
-import matplotlib
-# Use a non-interactive backend so the script works in CI / GitHub Actions
-matplotlib.use("Agg")
-
-import matplotlib.pyplot as plt
-import networkx as nx
-import numpy as np
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from automaton import DEFAULT_OVERLAP, OVERLAP_POLICIES, TermAutomaton
+from inverted_index import PositionalIndex
+from profiling import stage, start_profiling, stop_profiling
+from vocabulary import (
+    CompiledVocabulary,
+    canonical_terms,
+    fold_counts,
+    load_compiled_vocabulary,
+    overlap_groups,
+    parse_vocabulary,
+)
 
 # Paths to all relevant project files
 RESEARCH_FILE = Path("research.md")
@@ -37,12 +44,121 @@ VOCAB_FILE = Path("vocabulary.md")
 OUTPUT_JSON = Path("usage_stats.json")
 OUTPUT_PNG = Path("vocab_graph.png")
 
+# Per-document counts, written by default only when several documents are analyzed
+OUTPUT_DOC_JSON = Path("usage_stats_by_document.json")
+
+# Term x term co-occurrence matrix, written when co-occurrence is enabled
+OUTPUT_COOCCURRENCE = Path("cooccurrence.npz")
+
+# Persistent cache for per-document counts (see corpus.CountCache)
+CACHE_DIR = Path(".stats_cache")
+
+# Counting engine used by main(): one automaton pass over streamed chunks
+DEFAULT_ENGINE = "stream"
+
+# Number of characters read at a time by the streaming engine
+CHUNK_SIZE = 1 << 20
+
+# Graph layouts (implemented in graph.LAYOUTS) and the one used by main()
+GRAPH_LAYOUTS = ("spring", "radial")
+DEFAULT_LAYOUT = "spring"
+
+# Resolution of the rendered graph
+GRAPH_DPI = 300
+
+# Co-occurrence units (see cooccurrence.py): within N tokens or N sentences
+COOCCURRENCE_UNITS = ("token", "sentence")
+
 
 def load_text(path: Path) -> str:
     """
     Read the content of a text file and return it as a single string.
     """
-    return path.read_text(encoding="utf-8")
+    with stage("load_text"):
+        return path.read_text(encoding="utf-8")
+
+
+def hash_file(path: Path) -> str:
+    """
+    Return the SHA-256 hex digest of a file's content.
+    """
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_text_chunks(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Read a text file in chunks of about `chunk_size` characters.
+
+    Each chunk is cut right after its last whitespace character, and the
+    unfinished word at the end is carried over to the next chunk. This way
+    lowercasing a chunk never splits a word, and memory use stays flat
+    no matter how large the file is.
+    """
+    carry = ""
+    with path.open(encoding="utf-8") as handle:
+        while True:
+            block = handle.read(chunk_size)
+            if not block:
+                break
+            block = carry + block
+
+            cut = len(block)
+            while cut and not block[cut - 1].isspace():
+                cut -= 1
+            if cut == 0:
+                # No whitespace at all: pass the block through unchanged
+                cut = len(block)
+
+            yield block[:cut]
+            carry = block[cut:]
+
+    if carry:
+        yield carry
+
+
+def iter_mapped_chunks(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Memory-map a UTF-8 file and yield it as lowercased byte chunks.
+
+    Chunks are cut after the last ASCII whitespace byte (or at least on a
+    character boundary), so only one chunk at a time is ever copied.
+    Pure ASCII chunks are lowercased as bytes; other chunks are decoded,
+    lowercased and encoded again, which gives the same result as `str.lower`.
+    """
+    with path.open("rb") as handle:
+        if path.stat().st_size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            size = len(mapped)
+            start = 0
+            while start < size:
+                end = min(start + chunk_size, size)
+                if end < size:
+                    cut = max(mapped.rfind(sep, start, end) for sep in (b" ", b"\n", b"\t"))
+                    if cut >= start:
+                        end = cut + 1
+                    else:
+                        # Never split a multi-byte character: cut before it, or
+                        # after it when the chunk is shorter than the character
+                        boundary = end
+                        while boundary > start and 0x80 <= mapped[boundary] < 0xC0:
+                            boundary -= 1
+                        if boundary == start:
+                            boundary = end
+                            while boundary < size and 0x80 <= mapped[boundary] < 0xC0:
+                                boundary += 1
+                        end = boundary
+
+                window = mapped[start:end]
+                if window.isascii():
+                    yield window.lower()
+                else:
+                    yield window.decode("utf-8").lower().encode("utf-8")
+                start = end
 
 
 def extract_terms(vocab_md: str) -> List[str]:
@@ -56,6 +172,8 @@ def extract_terms(vocab_md: str) -> List[str]:
 
     Only the part after the first dot is used as a term,
     and everything is converted to lowercase for consistent matching.
+    `main` uses the structured `vocabulary.parse_vocabulary` instead, which
+    also splits off aliases and keeps the definitions.
     """
     terms: List[str] = []
     for line in vocab_md.splitlines():
@@ -68,12 +186,37 @@ def extract_terms(vocab_md: str) -> List[str]:
     return terms
 
 
-def count_frequencies(text: str, terms: List[str]) -> Dict[str, int]:
+@lru_cache(maxsize=8)
+def _compile_terms(
+    terms: Tuple[str, ...], utf8: bool = False, groups: Optional[Tuple[int, ...]] = None
+) -> TermAutomaton:
     """
-    Count how many times each vocabulary term appears in the research text.
+    Build (or reuse) the automaton for a term list.
 
-    Matching is case-insensitive. Word boundaries are used to reduce the
-    chance of partial matches (for example, "token" inside "tokenization").
+    Cached so that counting many documents with the same vocabulary,
+    for example in a corpus worker process, compiles the automaton once.
+    """
+    return TermAutomaton(terms, utf8=utf8, groups=groups)
+
+
+def _automaton_for(terms: List[str], automaton: Optional[TermAutomaton], utf8: bool = False) -> TermAutomaton:
+    """
+    Return `automaton` if it was built for `terms` in the same mode, else the compiled one.
+
+    `main` passes the automaton loaded with the vocabulary artifact, so the
+    str engines never compile their own. The mmap engine compiles a bytes
+    automaton with the same term groups.
+    """
+    if automaton is not None and automaton.terms == list(terms):
+        if automaton.utf8 == utf8:
+            return automaton
+        return _compile_terms(tuple(terms), utf8=utf8, groups=tuple(automaton.groups))
+    return _compile_terms(tuple(terms), utf8=utf8)
+
+
+def _count_regex(text: str, terms: List[str]) -> Dict[str, int]:
+    """
+    Count terms with one `re.findall` pass over the text per term.
     """
     frequencies: Dict[str, int] = {}
     text_lower = text.lower()
@@ -90,248 +233,703 @@ def count_frequencies(text: str, terms: List[str]) -> Dict[str, int]:
     return frequencies
 
 
-def _get_top_terms(freq: Dict[str, int], top_k: int = 3) -> List[str]:
+def _count_automaton(
+    text: str,
+    terms: List[str],
+    overlap: str = DEFAULT_OVERLAP,
+    automaton: Optional[TermAutomaton] = None,
+) -> Dict[str, int]:
+    """
+    Count all terms in a single scan of the text with an Aho-Corasick automaton.
+    """
+    found = _automaton_for(terms, automaton).count(text.lower(), overlap=overlap)
+    return {term: found.get(term, 0) for term in terms}
+
+
+def _count_numpy(text: str, terms: List[str]) -> Dict[str, int]:
+    """
+    Count all terms with vectorized NumPy operations over token ids.
     """
-    Return a list with the names of the top_k most frequent terms.
+    from vectorized import TokenIdCounter
+
+    return TokenIdCounter.build(text.lower()).count_terms(terms)
 
-    Only terms with a frequency > 0 are considered.
+
+def _count_stream(
+    path: Path,
+    terms: List[str],
+    overlap: str = DEFAULT_OVERLAP,
+    automaton: Optional[TermAutomaton] = None,
+) -> Dict[str, int]:
     """
-    non_zero = [(term, count) for term, count in freq.items() if count > 0]
-    if not non_zero:
-        return []
+    Count all terms in a file read chunk by chunk.
 
-    # Sort by frequency (descending), then alphabetically for stability
-    non_zero.sort(key=lambda x: (-x[1], x[0]))
-    return [term for term, _ in non_zero[:top_k]]
+    The automaton state and a short tail of the previous chunk are carried
+    across chunk edges, so terms that cross an edge are still counted.
+    """
+    scanner = _automaton_for(terms, automaton).scanner(overlap=overlap)
+    for chunk in iter_text_chunks(path):
+        scanner.feed(chunk.lower())
+    found = scanner.finish()
+    return {term: found.get(term, 0) for term in terms}
+
+
+def _count_mmap(
+    path: Path,
+    terms: List[str],
+    overlap: str = DEFAULT_OVERLAP,
+    automaton: Optional[TermAutomaton] = None,
+) -> Dict[str, int]:
+    """
+    Count all terms by matching UTF-8 term bytes against a memory-mapped file.
+
+    The file is never decoded or lowercased as a whole. A str `automaton`
+    cannot be used here, so the UTF-8 one is compiled (once per process).
+    """
+    scanner = _automaton_for(terms, automaton, utf8=True).scanner(overlap=overlap)
+    for chunk in iter_mapped_chunks(path):
+        scanner.feed(chunk)
+    found = scanner.finish()
+    return {term: found.get(term, 0) for term in terms}
 
 
-# ============================================================================
-#   Futuristic vocabulary graph generator (rectangles, glow, particles)
-# ============================================================================
+# Index kinds that can be built for a research file: (cache subdirectory, file suffix)
+INDEX_KINDS = {
+    "positional": ("index", ".pickle"),
+    "suffix": ("suffix", ".npz"),
+}
 
 
-def build_graph(freq: Dict[str, int]) -> None:
+def _index_class(kind: str):
+    """
+    Return the index class for a kind (the suffix array needs NumPy, so it is imported lazily).
     """
-    Build and save a vocabulary graph.
+    if kind == "suffix":
+        from suffix_array import SuffixArrayIndex
+
+        return SuffixArrayIndex
+    return PositionalIndex
+
 
-    Nodes:
-        - Center node: "Generative AI Applications"
-        - One node per vocabulary term that appears at least once in research.md
+# What loading a damaged or outdated index raises (a version mismatch is a
+# ValueError; a truncated `.npz` is a BadZipFile, one missing an array a KeyError)
+INDEX_LOAD_ERRORS = (OSError, EOFError, ValueError, TypeError, KeyError, pickle.UnpicklingError, zipfile.BadZipFile)
 
-    Visual style:
-        - Dark grid background
-        - Rectangular nodes (cards) instead of circles
-        - Glow around nodes
-        - Segmented edges to imitate a soft gradient
-        - Light particles scattered in the background
-        - Top-3 most frequent terms are highlighted in a separate color
 
-    Output is saved as `vocab_graph.png`.
+def load_index(path: Path, kind: str = "positional", cache_dir: Optional[Path] = CACHE_DIR):
     """
-    # Keep only terms that actually appear in the research text
-    used_terms = {term: count for term, count in freq.items() if count > 0}
+    Load an index of a research file, building it on first use.
 
-    # If nothing is used, create a simple message image and stop
-    if not used_terms:
-        plt.figure(figsize=(10, 6))
-        ax = plt.gca()
-        ax.set_facecolor("#030510")
-        plt.text(
-            0.5,
-            0.5,
-            "No vocabulary terms found in research.md",
-            ha="center",
-            va="center",
-            fontsize=12,
-            color="white",
-        )
-        plt.axis("off")
-        plt.savefig(OUTPUT_PNG, dpi=300, bbox_inches="tight")
-        plt.close()
-        return
+    Indexes are stored in `cache_dir` under the content hash of the file,
+    so an edited file simply gets a new index. An index that cannot be read
+    (truncated, or written by another version) is built again. Without a
+    `cache_dir` the index is built and used without being saved.
+    """
+    subdirectory, suffix = INDEX_KINDS[kind]
+    index_class = _index_class(kind)
+    if cache_dir is None:
+        return index_class.build(load_text(path).lower())
 
-    center_label = "Generative AI Applications"
-    top_terms = set(_get_top_terms(freq, top_k=3))
+    index_path = cache_dir / subdirectory / f"{hash_file(path)}{suffix}"
+    if index_path.exists():
+        try:
+            return index_class.load(index_path)
+        except INDEX_LOAD_ERRORS:
+            # Unreadable or outdated index: build it again
+            pass
 
-    # --- Create the graph structure ---
-    G = nx.Graph()
-    G.add_node(center_label, role="center", freq=0, size=3200)
+    index = index_class.build(load_text(path).lower())
+    index.save(index_path)
+    return index
 
-    for term, count in used_terms.items():
-        G.add_node(
-            term,
-            role="top" if term in top_terms else "normal",
-            freq=count,
-            size=1800 + count * 400,
-        )
-        G.add_edge(center_label, term, weight=count)
-
-    # --- Prepare the figure and background ---
-    fig = plt.figure(figsize=(20, 16))
-    ax = plt.gca()
-    plt.axis("off")
-
-    # Dark background color
-    ax.set_facecolor("#030510")
-
-    # Subtle grid lines for a "tech" feeling
-    for x in np.linspace(-1, 1, 30):
-        ax.axvline(x, color="#0a1028", linewidth=0.4, alpha=0.35)
-    for y in np.linspace(-1, 1, 30):
-        ax.axhline(y, color="#0a1028", linewidth=0.4, alpha=0.35)
-
-    # Spring layout gives a natural "network" shape
-    pos = nx.spring_layout(G, seed=42, k=1.2)
-
-    # --- Background light particles (small glowing dots) ---
-    particles_x = np.random.uniform(-1, 1, 140)
-    particles_y = np.random.uniform(-1, 1, 140)
-    plt.scatter(
-        particles_x,
-        particles_y,
-        s=12,
-        color="#3fd0ff",
-        alpha=0.18,
-    )
 
-    # --- Segmented edges (imitating a gradient / neon line) ---
-    for (u, v, edge_data) in G.edges(data=True):
-        x1, y1 = pos[u]
-        x2, y2 = pos[v]
-
-        # Interpolate points between the two nodes
-        steps = 40
-        xs = np.linspace(x1, x2, steps)
-        ys = np.linspace(y1, y2, steps)
-
-        for i in range(steps - 1):
-            # Alpha grows slightly along the edge
-            alpha = (i / steps) ** 1.5
-            plt.plot(
-                xs[i : i + 2],
-                ys[i : i + 2],
-                color=(0.2, 0.8, 1.0, 0.15 + alpha * 0.5),
-                linewidth=1.6,
-            )
+def _count_index(path: Path, terms: List[str], cache_dir: Optional[Path] = CACHE_DIR) -> Dict[str, int]:
+    """
+    Count all terms with the positional index of the file.
 
-    # --- Draw rectangular nodes with glow ---
-    for node, node_data in G.nodes(data=True):
-        x, y = pos[node]
-        size = node_data.get("size", 1800)
-        freq_value = node_data.get("freq", 0)
-        role = node_data.get("role", "normal")
-
-        # Convert "size" to rectangle width/height in layout coordinates.
-        # Denominators are tuned so labels fit comfortably inside.
-        rect_width = size / 8000.0   # wider rectangles
-        rect_height = size / 22000.0  # slightly taller rectangles
-
-        # Color scheme depends on node role.
-        # All faces are relatively light so black text is readable.
-        if role == "center":
-            face_color = "#ffe89c"    # light yellow
-            glow_color = "#fff7c7"
-        elif role == "top":
-            face_color = "#ffd1d9"    # light pink
-            glow_color = "#ffe4ea"
-        else:
-            face_color = "#d6ecff"    # light blue
-            glow_color = "#e6f4ff"
-
-        # Outer glow rectangle (first layer)
-        outer_glow = plt.Rectangle(
-            (x - rect_width / 2 - 0.012, y - rect_height / 2 - 0.012),
-            rect_width + 0.024,
-            rect_height + 0.024,
-            facecolor=glow_color,
-            edgecolor=None,
-            alpha=0.18,
-        )
-        ax.add_patch(outer_glow)
-
-        # Inner glow rectangle (second layer)
-        inner_glow = plt.Rectangle(
-            (x - rect_width / 2 - 0.006, y - rect_height / 2 - 0.006),
-            rect_width + 0.012,
-            rect_height + 0.012,
-            facecolor=glow_color,
-            edgecolor=None,
-            alpha=0.35,
-        )
-        ax.add_patch(inner_glow)
-
-        # Main rectangle for the node itself
-        rect = plt.Rectangle(
-            (x - rect_width / 2, y - rect_height / 2),
-            rect_width,
-            rect_height,
-            facecolor=face_color,
-            edgecolor="white",
-            linewidth=1.8,
-            alpha=0.96,
+    Only the first run tokenizes the text; later runs (for example with a
+    changed vocabulary) just intersect position lists.
+    """
+    return load_index(path, cache_dir=cache_dir).count_terms(terms)
+
+
+def _count_suffix(path: Path, terms: List[str], cache_dir: Optional[Path] = CACHE_DIR) -> Dict[str, int]:
+    """
+    Count all terms with the suffix array of the file (built on first use).
+    """
+    return load_index(path, kind="suffix", cache_dir=cache_dir).count_terms(terms)
+
+
+def count_term(path: Path, term: str, cache_dir: Optional[Path] = CACHE_DIR) -> int:
+    """
+    Answer an ad-hoc "how often does this term appear" query for one file.
+
+    The saved suffix array finds all occurrences in O(m log n), so repeated
+    queries against the same file never rescan the text.
+    """
+    return load_index(path, kind="suffix", cache_dir=cache_dir).count(term.lower())
+
+
+# Available counting engines. All of them return exactly the same counts.
+# Text engines work on a string that is already in memory ...
+COUNT_ENGINES = {
+    "regex": _count_regex,
+    "automaton": _count_automaton,
+    "numpy": _count_numpy,
+}
+
+# ... while file engines read the research file themselves.
+FILE_ENGINES = {
+    "stream": _count_stream,
+    "mmap": _count_mmap,
+    "index": _count_index,
+    "suffix": _count_suffix,
+}
+
+# Engines that run the single-pass scanner of `automaton.py`; only these
+# support overlap policies other than "independent"
+SCANNER_ENGINES = ("automaton", "stream", "mmap")
+
+
+def check_overlap(engine: str, overlap: str) -> None:
+    """
+    Raise ValueError unless `engine` can count with the `overlap` policy.
+    """
+    if overlap not in OVERLAP_POLICIES:
+        raise ValueError(f"Unknown overlap policy: {overlap!r} (expected one of {OVERLAP_POLICIES})")
+    if overlap != DEFAULT_OVERLAP and engine not in SCANNER_ENGINES:
+        raise ValueError(f"The {engine!r} engine only supports the {DEFAULT_OVERLAP!r} overlap policy")
+
+
+def check_groups(engine: str, groups: Sequence[int]) -> None:
+    """
+    Raise ValueError if the vocabulary has overlapping forms of one term and `engine` cannot resolve them.
+
+    `groups` are the automaton groups of the surface forms (see
+    `vocabulary.overlap_groups`); only the scanner counts a mention matched
+    by several forms of a term once.
+    """
+    if len(set(groups)) < len(groups) and engine not in SCANNER_ENGINES:
+        raise ValueError(
+            f"The vocabulary has overlapping forms of one term (e.g. an alias inside another); "
+            f"the {engine!r} engine would count such a mention twice (use one of {SCANNER_ENGINES})"
         )
-        ax.add_patch(rect)
-
-        # Node label in the center of the rectangle
-        # All labels are black so they stand out on a light face color.
-        plt.text(
-            x,
-            y,
-            node,
-            ha="center",
-            va="center",
-            fontsize=10,
-            fontweight="bold",
-            color="black",
+
+
+# Engines whose counts the co-occurrence pass reproduces: it always scans
+# the text as a stream of str chunks (see `count_file_cooccurrence`)
+COOCCURRENCE_ENGINES = ("automaton", "stream")
+
+
+def check_cooccurrence(engine: str, cooccurrence: Optional[str]) -> None:
+    """
+    Raise ValueError if co-occurrence is requested together with another engine.
+    """
+    if cooccurrence is not None and engine not in COOCCURRENCE_ENGINES:
+        raise ValueError(
+            f"Co-occurrence is counted by the streaming scanner; the {engine!r} engine "
+            f"cannot be used with it (use one of {COOCCURRENCE_ENGINES})"
         )
 
-        # Frequency value displayed slightly below the node (not for the center)
-        if node != center_label:
-            plt.text(
-                x,
-                y - rect_height * 0.9,
-                f"{freq_value}",
-                fontsize=8,
-                color="#4a6b86",
-                ha="center",
-                va="center",
-            )
 
-    # Title explaining what the viewer is looking at
-    plt.title(
-        "Generative AI Vocabulary — Futuristic Graph",
-        fontsize=20,
-        color="white",
-        pad=20,
-    )
+def count_frequencies(
+    text: str,
+    terms: List[str],
+    engine: str = "regex",
+    overlap: str = DEFAULT_OVERLAP,
+    automaton: Optional[TermAutomaton] = None,
+) -> Dict[str, int]:
+    """
+    Count how many times each vocabulary term appears in the research text.
+
+    Matching is case-insensitive. Word boundaries are used to reduce the
+    chance of partial matches (for example, "token" inside "tokenization").
+
+    `engine` selects the implementation (see `COUNT_ENGINES`):
+        - "regex": one regular expression pass per term
+        - "automaton": one Aho-Corasick pass for all terms together
+        - "numpy": vectorized n-gram hashing over token ids
+
+    `overlap` selects how overlapping matches are counted (see
+    `automaton.OVERLAP_POLICIES`); policies other than "independent" need
+    one of the `SCANNER_ENGINES`. Those engines use `automaton` when it was
+    built for `terms` instead of compiling one.
+    """
+    if engine not in COUNT_ENGINES:
+        raise ValueError(f"Unknown counting engine: {engine!r}")
+    check_overlap(engine, overlap)
+    if engine in SCANNER_ENGINES:
+        return COUNT_ENGINES[engine](text, terms, overlap=overlap, automaton=automaton)
+    return COUNT_ENGINES[engine](text, terms)
+
+
+def count_frequencies_many(
+    texts: Iterable[str],
+    terms: List[str],
+    pool: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> Iterator[Dict[str, int]]:
+    """
+    Count the same vocabulary in many texts, yielding one result per text.
+
+    The matcher is compiled once for the whole batch (see
+    `vocabulary.CompiledVocabulary`). `pool` can be "thread" or "process"
+    to spread the texts over `workers` threads or processes.
+    Long-lived callers should keep a `CompiledVocabulary` themselves.
+    """
+    return CompiledVocabulary(terms).count_many(texts, pool=pool, workers=workers)
 
-    plt.savefig(OUTPUT_PNG, dpi=300, bbox_inches="tight")
-    plt.close()
+
+def count_file(
+    path: Path,
+    terms: List[str],
+    engine: str = DEFAULT_ENGINE,
+    overlap: str = DEFAULT_OVERLAP,
+    automaton: Optional[TermAutomaton] = None,
+    cache_dir: Optional[Path] = CACHE_DIR,
+) -> Dict[str, int]:
+    """
+    Count how many times each vocabulary term appears in a research file.
+
+    File engines (see `FILE_ENGINES`) read the file on their own, for example
+    in fixed-size chunks. For text engines the whole file is loaded first.
+    The index engines keep their indexes in `cache_dir` (None: not saved).
+    """
+    if engine in FILE_ENGINES:
+        check_overlap(engine, overlap)
+        if engine in SCANNER_ENGINES:
+            return FILE_ENGINES[engine](path, terms, overlap=overlap, automaton=automaton)
+        return FILE_ENGINES[engine](path, terms, cache_dir=cache_dir)
+    return count_frequencies(load_text(path), terms, engine=engine, overlap=overlap, automaton=automaton)
+
+
+def count_file_cooccurrence(
+    path: Path,
+    terms: List[str],
+    unit: str = "token",
+    window: Optional[int] = None,
+    overlap: str = DEFAULT_OVERLAP,
+    automaton: Optional[TermAutomaton] = None,
+):
+    """
+    Count all terms in a file and, in the same pass, how often they co-occur.
+
+    Returns the counts and a `cooccurrence.CooccurrenceMatrix`; two terms
+    co-occur when they are at most `window` tokens (or sentences) apart.
+    Only the matches counted under the `overlap` policy co-occur.
+    """
+    from cooccurrence import CooccurrenceCounter
+
+    counter = CooccurrenceCounter(_automaton_for(terms, automaton), window=window, unit=unit, overlap=overlap)
+    for chunk in iter_text_chunks(path):
+        counter.feed(chunk.lower())
+    found, matrix = counter.finish()
+    return {term: found.get(term, 0) for term in terms}, matrix
+
+
+def build_graph(
+    freq: Dict[str, int],
+    layout: str = DEFAULT_LAYOUT,
+    output: Path = OUTPUT_PNG,
+    cache_dir: Optional[Path] = CACHE_DIR,
+    dpi: int = GRAPH_DPI,
+    cooccurrence=None,
+) -> None:
+    """
+    Build and save the vocabulary graph (see `graph.build_graph`).
+
+    The plotting stack (matplotlib, networkx, numpy) is imported only here,
+    so counting-only callers never pay for it. With a `cooccurrence`
+    matrix the strongest term pairs are drawn as weighted edges.
+    """
+    with stage("graph"):
+        with stage("import_graph"):
+            from graph import build_graph as render_graph
+
+        render_graph(
+            freq,
+            layout=layout,
+            output=output,
+            cache_dir=cache_dir,
+            dpi=dpi,
+            cooccurrence=cooccurrence,
+        )
 
 
-def main() -> None:
+def _write_json(path: Path, data) -> None:
+    """
+    Save data as pretty-printed JSON.
+    """
+    with stage("write_json"):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(data, indent=4, ensure_ascii=False),
+            encoding="utf-8",
+        )
+
+
+def main(
+    research: Union[Path, Sequence[Path]] = RESEARCH_FILE,
+    workers: Optional[int] = None,
+    cache_dir: Optional[Path] = CACHE_DIR,
+    engine: str = DEFAULT_ENGINE,
+    layout: str = DEFAULT_LAYOUT,
+    stats_only: bool = False,
+    vocab: Path = VOCAB_FILE,
+    output_json: Path = OUTPUT_JSON,
+    output_doc_json: Optional[Path] = None,
+    output_png: Path = OUTPUT_PNG,
+    dpi: int = GRAPH_DPI,
+    cooccurrence: Optional[str] = None,
+    window: Optional[int] = None,
+    output_cooccurrence: Path = OUTPUT_COOCCURRENCE,
+    output_matrix: Optional[Path] = None,
+    overlap: str = DEFAULT_OVERLAP,
+) -> None:
     """
     Main entry point:
     - read markdown files
-    - compute frequencies
+    - parse and compile the vocabulary, or load both from the artifact
+      cached for this vocabulary (see `vocabulary.load_compiled_vocabulary`)
+    - compute frequencies, crediting aliases to their canonical term
     - write JSON statistics
     - build the visualization graph
+
+    `research` may also be a directory or a list of files. In that case every
+    document is counted in a pool of `workers` processes, per-document counts
+    are written to `output_doc_json` (default `OUTPUT_DOC_JSON`) and the
+    throughput of each worker is printed. A single file writes per-document
+    counts only when `output_doc_json` is given. With `output_matrix` the
+    per-document counts are also saved as a sparse term x document matrix
+    in that directory (see `term_matrix.py`), one column for a single file.
+
+    Per-document counts are cached in `cache_dir` (pass None to disable),
+    so only documents that changed since the last run are counted again.
+    `engine` selects the counting engine (see `COUNT_ENGINES` and `FILE_ENGINES`)
+    and `layout` the graph layout (see `graph.LAYOUTS`).
+    With `stats_only` only `output_json` is written and the plotting
+    stack is never imported.
+
+    `cooccurrence` ("token" or "sentence", see `COOCCURRENCE_UNITS`) also
+    counts which terms appear within `window` tokens or sentences of each
+    other, in the same pass. The matrix is saved to `output_cooccurrence`
+    and the strongest pairs are drawn as term-term edges.
+
+    `overlap` selects how overlapping terms are counted (see
+    `automaton.OVERLAP_POLICIES`); "leftmost-longest" counts a mention of
+    "vector database" once instead of also counting "database".
+
+    All inputs and outputs are arguments, so one process can run the
+    pipeline for several corpora.
     """
-    research_text = load_text(RESEARCH_FILE)
-    vocab_text = load_text(VOCAB_FILE)
+    # Imported here because corpus.py itself imports this module
+    from corpus import CountCache, count_corpus, find_documents, format_throughput
+
+    check_overlap(engine, overlap)
+    check_cooccurrence(engine, cooccurrence)
+    entries, automaton = load_compiled_vocabulary(vocab, cache_dir / "vocabulary" if cache_dir else None)
+    check_groups(engine, automaton.groups)
+    # Aliases are counted in the same pass as the canonical terms
+    forms = automaton.terms
+    # Counts made under another overlap policy are kept apart
+    cache = CountCache(cache_dir / "counts" / overlap, forms, automaton.groups) if cache_dir else None
+
+    single = isinstance(research, Path) and not research.is_dir()
+    cooccurrence_settings = (cooccurrence, window) if cooccurrence else None
+    with stage("count"):
+        if single:
+            result = count_corpus(
+                [research],
+                forms,
+                engine=engine,
+                workers=1,
+                cache=cache,
+                cooccurrence=cooccurrence_settings,
+                overlap=overlap,
+                automaton=automaton,
+                cache_dir=cache_dir,
+            )
+        else:
+            if isinstance(research, Path):
+                documents, root = find_documents(research), research
+            else:
+                documents, root = expand_documents(research), None
+
+            result = count_corpus(
+                documents,
+                forms,
+                engine=engine,
+                workers=workers,
+                root=root,
+                cache=cache,
+                cooccurrence=cooccurrence_settings,
+                overlap=overlap,
+                automaton=automaton,
+                cache_dir=cache_dir,
+            )
+
+    # Credit every alias to its canonical term
+    freq = fold_counts(entries, result.totals)
+    matrix = result.cooccurrence
+    if matrix is not None:
+        matrix = matrix.fold(list(freq), canonical_terms(entries))
+
+    document_counts = {name: fold_counts(entries, counts) for name, counts in result.documents.items()}
+    if not single or output_doc_json is not None:
+        # Only non-zero counts are stored per document to keep the file small
+        _write_json(
+            output_doc_json or OUTPUT_DOC_JSON,
+            {
+                name: {term: count for term, count in counts.items() if count}
+                for name, counts in document_counts.items()
+            },
+        )
+    if output_matrix is not None:
+        from term_matrix import TermDocumentMatrix
+
+        with stage("write_matrix"):
+            TermDocumentMatrix.from_counts(list(freq), document_counts).save(output_matrix)
 
-    terms = extract_terms(vocab_text)
-    freq = count_frequencies(research_text, terms)
+    if not single:
+        for line in format_throughput(result):
+            print(line)
 
     # Save frequency statistics as pretty-printed JSON
-    OUTPUT_JSON.write_text(
-        json.dumps(freq, indent=4, ensure_ascii=False),
-        encoding="utf-8",
-    )
+    _write_json(output_json, freq)
+
+    if matrix is not None:
+        matrix.save(output_cooccurrence)
 
     # Build the graph
-    build_graph(freq)
+    if not stats_only:
+        build_graph(
+            freq,
+            layout=layout,
+            output=output_png,
+            cache_dir=cache_dir,
+            dpi=dpi,
+            cooccurrence=matrix,
+        )
+
+
+def expand_documents(paths: Iterable[Path]) -> List[Path]:
+    """
+    Replace every directory by the documents below it and drop repeated files.
+
+    A file named twice (for example directly and through a glob) is kept
+    once, in the position where it first appeared.
+    """
+    # Imported here because corpus.py itself imports this module
+    from corpus import find_documents
+
+    documents: Dict[Path, Path] = {}
+    for path in paths:
+        for document in find_documents(path) if path.is_dir() else [path]:
+            documents.setdefault(document.resolve(), document)
+    return list(documents.values())
+
+
+def resolve_research(patterns: Sequence[str]) -> Union[Path, List[Path]]:
+    """
+    Turn command-line research arguments into what `main` expects.
+
+    Arguments may be files, directories or glob patterns (`**` is allowed).
+    A single file or directory is returned as is, anything else as a list
+    of files (directories expanded, each file once). Raises ValueError for
+    a file or directory that does not exist.
+    """
+    paths: List[Path] = []
+    for pattern in patterns:
+        if any(ch in pattern for ch in "*?["):
+            paths.extend(sorted(Path(match) for match in glob.glob(pattern, recursive=True) if Path(match).is_file()))
+        elif Path(pattern).exists():
+            paths.append(Path(pattern))
+        else:
+            raise ValueError(f"research path does not exist: {pattern}")
+
+    if len(paths) == 1 and not any(ch in patterns[0] for ch in "*?["):
+        return paths[0]
+    return expand_documents(paths)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """
+    Parse the command-line options of the pipeline.
+    """
+    parser = argparse.ArgumentParser(
+        description="Count vocabulary terms in research documents and draw the vocabulary graph.",
+    )
+    parser.add_argument(
+        "research",
+        nargs="*",
+        default=[str(RESEARCH_FILE)],
+        help="research files, directories or glob patterns (default: %(default)s)",
+    )
+    parser.add_argument("--vocab", type=Path, default=VOCAB_FILE, help="vocabulary markdown file")
+    parser.add_argument("--output-json", type=Path, default=OUTPUT_JSON, help="total counts (JSON)")
+    parser.add_argument(
+        "--output-doc-json",
+        type=Path,
+        default=None,
+        help=f"per-document counts (JSON, default: {OUTPUT_DOC_JSON}); a single file writes them only when given",
+    )
+    parser.add_argument(
+        "--output-matrix",
+        type=Path,
+        default=None,
+        help="directory for the sparse term x document matrix (.npy files)",
+    )
+    parser.add_argument("--output-png", type=Path, default=OUTPUT_PNG, help="rendered graph")
+    parser.add_argument(
+        "--engine",
+        choices=sorted(COUNT_ENGINES) + sorted(FILE_ENGINES),
+        default=DEFAULT_ENGINE,
+        help="counting engine (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--overlap",
+        choices=OVERLAP_POLICIES,
+        default=DEFAULT_OVERLAP,
+        help="how overlapping terms are counted (policies other than %(default)s need the automaton, stream or mmap engine)",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--layout", choices=GRAPH_LAYOUTS, default=DEFAULT_LAYOUT, help="graph layout")
+    parser.add_argument("--dpi", type=int, default=GRAPH_DPI, help="graph resolution (default: %(default)s)")
+    parser.add_argument(
+        "--cooccurrence",
+        choices=COOCCURRENCE_UNITS,
+        default=None,
+        help="also count term co-occurrence within a window of tokens or sentences and draw it "
+        "(needs the automaton or stream engine)",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=None,
+        help="co-occurrence window (default: 10 tokens, or the same sentence)",
+    )
+    parser.add_argument(
+        "--output-cooccurrence",
+        type=Path,
+        default=OUTPUT_COOCCURRENCE,
+        help="co-occurrence matrix (.npz)",
+    )
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR, help="cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write any cache")
+    parser.add_argument(
+        "--no-graph",
+        "--stats-only",
+        dest="stats_only",
+        action="store_true",
+        help="only write the JSON statistics (never imports the plotting stack)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and update the outputs whenever an input file changes",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="write wall time, CPU time and peak memory of every pipeline stage to this JSON file",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        default=None,
+        help="also write the stages as a Chrome trace-event file (chrome://tracing, Perfetto)",
+    )
+
+    args = parser.parse_args(argv)
+    try:
+        args.research = resolve_research(args.research)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.research == []:
+        parser.error("no research documents match the given arguments")
+    if args.watch:
+        # Watch mode counts in this process and writes only the JSON files and the graph
+        unsupported = {
+            "--workers": args.workers,
+            "--cooccurrence": args.cooccurrence,
+            "--window": args.window,
+            "--output-matrix": args.output_matrix,
+            "--profile": args.profile,
+            "--trace": args.trace,
+        }
+        given = [option for option, value in unsupported.items() if value is not None]
+        if given:
+            parser.error(f"--watch cannot be combined with {', '.join(given)}")
+    try:
+        check_overlap(args.engine, args.overlap)
+        check_cooccurrence(args.engine, args.cooccurrence)
+        if args.engine not in SCANNER_ENGINES and args.vocab.is_file():
+            check_groups(args.engine, overlap_groups(canonical_terms(parse_vocabulary(load_text(args.vocab)))))
+    except ValueError as error:
+        parser.error(str(error))
+    return args
+
+
+def cli(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    Command-line entry point (`python stats.py --help`).
+    """
+    args = parse_args(argv)
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    if args.watch:
+        # Imported here because watch.py itself imports this module
+        from watch import Watcher
+
+        watcher = Watcher(
+            research=args.research,
+            vocab=args.vocab,
+            engine=args.engine,
+            layout=args.layout,
+            stats_only=args.stats_only,
+            output_json=args.output_json,
+            output_doc_json=args.output_doc_json,
+            output_png=args.output_png,
+            cache_dir=cache_dir,
+            dpi=args.dpi,
+            overlap=args.overlap,
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.profile or args.trace:
+        start_profiling()
+    try:
+        main(
+            research=args.research,
+            workers=args.workers,
+            cache_dir=cache_dir,
+            engine=args.engine,
+            layout=args.layout,
+            stats_only=args.stats_only,
+            vocab=args.vocab,
+            output_json=args.output_json,
+            output_doc_json=args.output_doc_json,
+            output_png=args.output_png,
+            dpi=args.dpi,
+            cooccurrence=args.cooccurrence,
+            window=args.window,
+            output_cooccurrence=args.output_cooccurrence,
+            output_matrix=args.output_matrix,
+            overlap=args.overlap,
+        )
+    finally:
+        recorder = stop_profiling()
+        if recorder is not None:
+            if args.profile:
+                recorder.write_report(args.profile)
+            if args.trace:
+                recorder.write_chrome_trace(args.trace)
 
 
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,146 @@
+"""
+suffix_array.py
+
+Suffix-array index for ad-hoc "how often does X appear" queries.
+
+The array is built once over the lowercased research text (prefix doubling
+with NumPy) and saved to disk. Afterwards the suffixes that start with a
+term form one contiguous block of the array, which two binary searches find
+in O(m log n) for a term of length m. Each occurrence in that block is then
+checked with the same `\\b` word-boundary and non-overlap rules as the regex
+path in `stats.count_frequencies`.
+"""
+
+import bisect
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from automaton import is_word_char
+
+
+def build_suffix_array(text: str) -> np.ndarray:
+    """
+    Return the start positions of all suffixes of `text` in sorted order.
+
+    Uses prefix doubling: after round k the suffixes are sorted by their
+    first 2**k characters, so about log2(n) vectorized sorts are needed.
+    """
+    size = len(text)
+    if size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    rank = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    order = np.argsort(rank, kind="stable")
+    step = 1
+    while step < size:
+        # Rank of the suffix `step` characters later; -1 sorts "past the end" first
+        second = np.full(size, -1, dtype=np.int64)
+        second[:-step] = rank[step:]
+
+        order = np.lexsort((second, rank))
+        sorted_rank = rank[order]
+        sorted_second = second[order]
+        changed = (sorted_rank[1:] != sorted_rank[:-1]) | (sorted_second[1:] != sorted_second[:-1])
+
+        rank = np.empty(size, dtype=np.int64)
+        rank[order] = np.concatenate(([0], np.cumsum(changed)))
+        if rank[order[-1]] == size - 1:
+            # All ranks are unique, the order is final
+            break
+        step *= 2
+    return order
+
+
+class SuffixArrayIndex:
+    """
+    Lowercased text plus its suffix array.
+    """
+
+    def __init__(self, text_lower: str, suffixes: np.ndarray) -> None:
+        self.text = text_lower
+        self.suffixes = suffixes
+
+    @classmethod
+    def build(cls, text_lower: str) -> "SuffixArrayIndex":
+        """
+        Build the suffix array of an already lowercased text.
+        """
+        suffixes = build_suffix_array(text_lower)
+        # 32-bit positions are enough for texts below 2 GB and halve the file size
+        if len(text_lower) < 2**31:
+            suffixes = suffixes.astype(np.int32)
+        return cls(text_lower, suffixes)
+
+    def find(self, term: str) -> np.ndarray:
+        """
+        Return the sorted start positions of every raw occurrence of `term`.
+        """
+        text = self.text
+        length = len(term)
+
+        def prefix(position) -> str:
+            return text[position : position + length]
+
+        low = bisect.bisect_left(self.suffixes, term, key=prefix)
+        high = bisect.bisect_right(self.suffixes, term, lo=low, key=prefix)
+        return np.sort(self.suffixes[low:high])
+
+    def count(self, term: str) -> int:
+        """
+        Count occurrences of a lowercased term, like `re.findall(r"\\bterm\\b")`.
+        """
+        if not term:
+            return 0
+
+        text = self.text
+        length = len(term)
+        first_is_word = is_word_char(term[0])
+        last_is_word = is_word_char(term[-1])
+
+        count = 0
+        last_end = 0
+        for start in self.find(term).tolist():
+            end = start + length
+            if start < last_end:
+                continue
+            if (start > 0 and is_word_char(text[start - 1])) == first_is_word:
+                continue
+            if (end < len(text) and is_word_char(text[end])) == last_is_word:
+                continue
+            count += 1
+            last_end = end
+        return count
+
+    def count_terms(self, terms: List[str]) -> Dict[str, int]:
+        """
+        Count every term of the vocabulary.
+        """
+        return {term: self.count(term) for term in terms}
+
+    def save(self, path: Path) -> None:
+        """
+        Write the text and the suffix array to one `.npz` file.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see half an index
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        with temporary.open("wb") as handle:
+            np.savez(
+                handle,
+                text=np.frombuffer(self.text.encode("utf-8"), dtype=np.uint8),
+                suffixes=self.suffixes,
+            )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SuffixArrayIndex":
+        """
+        Read an index written by `save`.
+        """
+        with np.load(path) as data:
+            text = data["text"].tobytes().decode("utf-8")
+            suffixes = data["suffixes"]
+        return cls(text, suffixes)
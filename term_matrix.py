@@ -0,0 +1,151 @@
+"""
+term_matrix.py
+
+Sparse term x document count matrix for multi-document corpora.
+
+`usage_stats_by_document.json` has to be parsed as a whole before any count
+can be read. The matrix written here holds the same numbers in compressed
+sparse row (CSR) form, one row per term and one column per document, as
+plain files in one directory:
+
+    indptr.npy      int64, len(terms) + 1 row offsets
+    indices.npy     int32, document (column) index of every non-zero count
+    data.npy        int32, the non-zero counts
+    terms.txt       one term per line (row order)
+    documents.txt   one document name per line (column order)
+
+The `.npy` files can be memory-mapped (`TermDocumentMatrix.load` does this
+by default), and `scipy.sparse.csr_matrix((data, indices, indptr))` reads
+them directly where SciPy is available.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+
+class TermDocumentMatrix:
+    """
+    Term x document counts in CSR form (rows are terms, columns documents).
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        documents: Sequence[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+    ) -> None:
+        self.terms: List[str] = list(terms)
+        self.documents: List[str] = list(documents)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def from_counts(cls, terms: Sequence[str], counts: Mapping[str, Mapping[str, int]]) -> "TermDocumentMatrix":
+        """
+        Build the matrix from per-document counts (document name -> term -> count).
+        """
+        term_ids: Dict[str, int] = {}
+        for row, term in enumerate(terms):
+            term_ids.setdefault(term, row)
+        rows: List[int] = []
+        columns: List[int] = []
+        values: List[int] = []
+        for column, document_counts in enumerate(counts.values()):
+            for term, count in document_counts.items():
+                if count:
+                    rows.append(term_ids[term])
+                    columns.append(column)
+                    values.append(count)
+
+        rows_array = np.array(rows, dtype=np.int64)
+        # Documents were visited in column order, so a stable sort by row keeps columns sorted
+        order = np.argsort(rows_array, kind="stable")
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows_array, minlength=len(terms)), out=indptr[1:])
+        return cls(
+            terms,
+            list(counts),
+            indptr,
+            np.array(columns, dtype=np.int32)[order],
+            np.array(values, dtype=np.int32)[order],
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        (number of terms, number of documents).
+        """
+        return len(self.terms), len(self.documents)
+
+    def term_counts(self, term: str) -> Dict[str, int]:
+        """
+        Return the non-zero counts of one term, per document.
+        """
+        row = self.terms.index(term)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return {
+            self.documents[column]: int(count)
+            for column, count in zip(self.indices[start:end].tolist(), self.data[start:end].tolist())
+        }
+
+    def document_counts(self, document: str) -> Dict[str, int]:
+        """
+        Return the non-zero counts of one document, per term.
+        """
+        column = self.documents.index(document)
+        found = self.indices == column
+        rows = self._rows()[found]
+        return {self.terms[row]: int(count) for row, count in zip(rows.tolist(), self.data[found].tolist())}
+
+    def totals(self) -> Dict[str, int]:
+        """
+        Return the total count of every term over all documents.
+        """
+        sums = np.bincount(self._rows(), weights=self.data, minlength=len(self.terms))
+        return {term: int(total) for term, total in zip(self.terms, sums.tolist())}
+
+    def _rows(self) -> np.ndarray:
+        """
+        Return the row (term) index of every stored count.
+        """
+        return np.repeat(np.arange(len(self.terms)), np.diff(self.indptr))
+
+    def save(self, directory: Path) -> None:
+        """
+        Write the matrix as `.npy` arrays plus the term and document index files.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "indptr.npy", self.indptr)
+        np.save(directory / "indices.npy", self.indices)
+        np.save(directory / "data.npy", self.data)
+        (directory / "terms.txt").write_text("".join(f"{term}\n" for term in self.terms), encoding="utf-8")
+        (directory / "documents.txt").write_text(
+            "".join(f"{document}\n" for document in self.documents),
+            encoding="utf-8",
+        )
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "TermDocumentMatrix":
+        """
+        Read a matrix written by `save`, memory-mapping the arrays by default.
+        """
+        mode = "r" if mmap else None
+        return cls(
+            _read_lines(directory / "terms.txt"),
+            _read_lines(directory / "documents.txt"),
+            np.load(directory / "indptr.npy", mmap_mode=mode),
+            np.load(directory / "indices.npy", mmap_mode=mode),
+            np.load(directory / "data.npy", mmap_mode=mode),
+        )
+
+
+def _read_lines(path: Path) -> List[str]:
+    """
+    Read an index file written by `save` (one entry per line).
+    """
+    return path.read_text(encoding="utf-8").split("\n")[:-1]
@@ -0,0 +1,176 @@
+"""
+Randomized checks of the counting engines against simple reference implementations.
+
+Every engine must give the same counts as the `regex` engine, also when the
+text is fed in tiny chunks. The overlap policies and co-occurrence are
+checked against brute-force versions that look at every occurrence.
+"""
+
+import bisect
+import random
+import re
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pytest
+
+import stats
+from automaton import OVERLAP_POLICIES, TermAutomaton
+from cooccurrence import CooccurrenceCounter, unit_boundaries
+
+# Words of the random texts; a few are shared prefixes of others or contain non-ASCII letters
+WORDS = ("ai", "Gen", "generative", "model", "models", "Über", "naïve", "data", "base", "database", "x_1", "ß")
+SEPARATORS = (" ", " ", " ", "\n", ", ", ". ", "-", "/", "\n\n")
+
+# Random cases per test (fewer for the tests that write a file per case)
+ROUNDS = 150
+FILE_ROUNDS = 50
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    """
+    Join random words with random separators.
+    """
+    return "".join(rng.choice(WORDS) + rng.choice(SEPARATORS) for _ in range(words))
+
+
+def random_terms(rng: random.Random) -> List[str]:
+    """
+    Build a few lowercased terms of one to three words (nested terms are likely).
+    """
+    terms = []
+    for _ in range(rng.randint(1, 6)):
+        words = [rng.choice(WORDS).lower() for _ in range(rng.randint(1, 3))]
+        terms.append(rng.choice((" ", "-", " ")).join(words))
+    return list(dict.fromkeys(terms))
+
+
+def occurrences(text_lower: str, terms: List[str]) -> List[Tuple[int, int, int]]:
+    """
+    Every `\\b`-delimited occurrence of every term, overlapping ones included: (term id, start, end).
+    """
+    found = []
+    for term_id, term in enumerate(terms):
+        for match in re.finditer(r"(?=\b" + re.escape(term) + r"\b)", text_lower):
+            found.append((term_id, match.start(), match.start() + len(term)))
+    return found
+
+
+def leftmost_longest(text_lower: str, terms: List[str]) -> List[Tuple[int, int, int]]:
+    """
+    Brute-force leftmost-longest selection over all occurrences, in text order.
+    """
+    chosen = []
+    end = 0
+    for term_id, start, stop in sorted(occurrences(text_lower, terms), key=lambda m: (m[1], m[1] - m[2])):
+        if start >= end:
+            chosen.append((term_id, start, stop))
+            end = stop
+    return chosen
+
+
+def feed_in_chunks(scanner, text, rng: random.Random, largest: int = 7) -> Dict[str, int]:
+    """
+    Feed `text` to a scanner in random chunks of 1 to `largest` characters.
+    """
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, largest)
+        scanner.feed(text[position : position + size])
+        position += size
+    return scanner.finish()
+
+
+@pytest.mark.parametrize("engine", sorted(stats.COUNT_ENGINES))
+def test_text_engines_match_regex(engine: str) -> None:
+    rng = random.Random(engine)
+    for _ in range(ROUNDS):
+        text = random_text(rng, rng.randint(0, 40))
+        terms = random_terms(rng)
+        expected = stats.count_frequencies(text, terms, engine="regex")
+        assert stats.count_frequencies(text, terms, engine=engine) == expected
+
+
+@pytest.mark.parametrize("engine", sorted(stats.FILE_ENGINES))
+def test_file_engines_match_regex(engine: str, tmp_path: Path) -> None:
+    rng = random.Random(engine)
+    document = tmp_path / "document.md"
+    for _ in range(FILE_ROUNDS):
+        text = random_text(rng, rng.randint(0, 40))
+        terms = random_terms(rng)
+        document.write_text(text, encoding="utf-8")
+        expected = stats.count_frequencies(text, terms, engine="regex")
+        assert stats.count_file(document, terms, engine=engine, cache_dir=tmp_path / "cache") == expected
+
+
+def test_tiny_file_chunks_match_regex(tmp_path: Path) -> None:
+    rng = random.Random(0)
+    document = tmp_path / "document.md"
+    for _ in range(FILE_ROUNDS):
+        text = random_text(rng, rng.randint(0, 30))
+        terms = random_terms(rng)
+        document.write_text(text, encoding="utf-8")
+        expected = stats.count_frequencies(text, terms, engine="regex")
+
+        for chunk_size in (1, 2, 3, 5):
+            scanner = TermAutomaton(terms).scanner()
+            for chunk in stats.iter_text_chunks(document, chunk_size=chunk_size):
+                scanner.feed(chunk.lower())
+            assert scanner.finish() == expected
+
+            scanner = TermAutomaton(terms, utf8=True).scanner()
+            for chunk in stats.iter_mapped_chunks(document, chunk_size=chunk_size):
+                scanner.feed(chunk)
+            assert scanner.finish() == expected
+
+
+@pytest.mark.parametrize("overlap", OVERLAP_POLICIES)
+def test_overlap_policies_match_brute_force(overlap: str) -> None:
+    rng = random.Random(overlap)
+    for _ in range(ROUNDS):
+        text_lower = random_text(rng, rng.randint(0, 30)).lower()
+        terms = random_terms(rng)
+        automaton = TermAutomaton(terms)
+        scanner = automaton.scanner(record=True, overlap=overlap)
+        counts = feed_in_chunks(scanner, text_lower, rng)
+
+        if overlap == "independent":
+            assert counts == stats.count_frequencies(text_lower, terms, engine="regex")
+            continue
+        if overlap == "leftmost-longest":
+            expected = leftmost_longest(text_lower, terms)
+            assert scanner.matches == expected
+        else:
+            expected = occurrences(text_lower, terms)
+            assert sorted(scanner.matches) == sorted(expected)
+        assert counts == {term: sum(1 for match in expected if match[0] == term_id) for term_id, term in enumerate(terms)}
+
+
+@pytest.mark.parametrize("unit", ["token", "sentence"])
+@pytest.mark.parametrize("overlap", OVERLAP_POLICIES)
+def test_cooccurrence_matches_brute_force(unit: str, overlap: str) -> None:
+    rng = random.Random(f"{unit}-{overlap}")
+    for _ in range(ROUNDS):
+        text_lower = random_text(rng, rng.randint(0, 40)).lower()
+        terms = random_terms(rng)
+        window = rng.randint(0, 3)
+        automaton = TermAutomaton(terms)
+
+        # Reference: matches of one unchunked scan, units from one regex pass over the whole text
+        scanner = automaton.scanner(record=True, overlap=overlap)
+        scanner.feed(text_lower)
+        scanner.finish()
+        boundaries = unit_boundaries(text_lower, unit)
+        units = [bisect.bisect_right(boundaries, start) for _, start, _ in scanner.matches]
+        expected: Dict[Tuple[str, str], int] = {}
+        for first in range(len(units)):
+            for second in range(first + 1, len(units)):
+                ids = sorted((scanner.matches[first][0], scanner.matches[second][0]))
+                if ids[0] != ids[1] and abs(units[first] - units[second]) <= window:
+                    pair = (automaton.terms[ids[0]], automaton.terms[ids[1]])
+                    expected[pair] = expected.get(pair, 0) + 1
+
+        counter = CooccurrenceCounter(automaton, window=window, unit=unit, overlap=overlap)
+        counts, matrix = feed_in_chunks(counter, text_lower, rng, largest=9)
+        assert counts == scanner.finish()
+        assert {(first, second): count for first, second, count in matrix.pairs()} == expected
@@ -0,0 +1,65 @@
+"""
+Checks of the on-disk index caches: damaged or outdated indexes are rebuilt.
+"""
+
+import pickle
+from pathlib import Path
+
+import stats
+from inverted_index import INDEX_VERSION
+
+
+def write_document(tmp_path: Path) -> Path:
+    """
+    Write a small research file.
+    """
+    path = tmp_path / "doc.md"
+    path.write_text("Generative AI and a vector database. generative ai!", encoding="utf-8")
+    return path
+
+
+def count(path: Path, cache_dir: Path) -> int:
+    """
+    Count one term with the cached positional index.
+    """
+    return stats.load_index(path, cache_dir=cache_dir).count_terms(["generative ai"])["generative ai"]
+
+
+def test_truncated_index_is_rebuilt(tmp_path: Path):
+    path = write_document(tmp_path)
+    cache_dir = tmp_path / "cache"
+    assert count(path, cache_dir) == 2
+    (index_path,) = (cache_dir / "index").iterdir()
+    index_path.write_bytes(index_path.read_bytes()[:10])
+
+    assert count(path, cache_dir) == 2
+    # The rebuilt index replaced the damaged one, without leaving temporary files behind
+    assert list((cache_dir / "index").iterdir()) == [index_path]
+    assert stats.load_index(path, cache_dir=cache_dir).count_terms(["vector database"]) == {"vector database": 1}
+
+
+def test_index_of_another_version_is_rebuilt(tmp_path: Path):
+    path = write_document(tmp_path)
+    cache_dir = tmp_path / "cache"
+    stats.load_index(path, cache_dir=cache_dir)
+    (index_path,) = (cache_dir / "index").iterdir()
+    with index_path.open("wb") as handle:
+        pickle.dump((INDEX_VERSION + 1, 0, {}), handle)
+
+    assert count(path, cache_dir) == 2
+    with index_path.open("rb") as handle:
+        assert pickle.load(handle)[0] == INDEX_VERSION
+
+
+def test_damaged_suffix_array_is_rebuilt(tmp_path: Path):
+    path = write_document(tmp_path)
+    cache_dir = tmp_path / "cache"
+    assert stats.count_term(path, "Generative AI", cache_dir=cache_dir) == 2
+    (index_path,) = (cache_dir / "suffix").iterdir()
+    data = index_path.read_bytes()
+
+    for damaged in (data[: len(data) // 2], b"", b"not a zip file"):
+        index_path.write_bytes(damaged)
+        assert stats.count_term(path, "Generative AI", cache_dir=cache_dir) == 2
+        assert list((cache_dir / "suffix").iterdir()) == [index_path]
+        assert index_path.read_bytes() == data
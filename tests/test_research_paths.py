@@ -0,0 +1,49 @@
+"""
+Checks of how command-line research arguments become the documents to count.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import stats
+
+
+@pytest.fixture
+def tree(tmp_path: Path, monkeypatch) -> Path:
+    """
+    `docs/a.md`, `docs/sub/b.md`, `docs/notes.txt` and `top.md`, with `tmp_path` as the working directory.
+    """
+    (tmp_path / "docs" / "sub").mkdir(parents=True)
+    for name in ("docs/a.md", "docs/sub/b.md", "docs/notes.txt", "top.md"):
+        (tmp_path / name).write_text("generative ai", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_single_file_or_directory_is_kept(tree: Path):
+    assert stats.resolve_research(["top.md"]) == Path("top.md")
+    assert stats.resolve_research(["docs"]) == Path("docs")
+
+
+def test_directories_and_globs_are_expanded_once(tree: Path):
+    documents = stats.resolve_research(["top.md", "docs", "docs/**/*.md", "./top.md"])
+    assert documents == [Path("top.md"), *stats.expand_documents([Path("docs")])]
+    assert sorted(path.resolve() for path in documents) == sorted(
+        (tree / name).resolve() for name in ("top.md", "docs/a.md", "docs/sub/b.md")
+    )
+
+
+def test_glob_matching_nothing_gives_no_documents(tree: Path):
+    assert stats.resolve_research(["missing/*.md"]) == []
+    with pytest.raises(SystemExit):
+        stats.parse_args(["missing/*.md"])
+
+
+def test_missing_path_is_a_usage_error(tree: Path, capsys):
+    with pytest.raises(ValueError):
+        stats.resolve_research(["top.md", "missing.md"])
+    with pytest.raises(SystemExit) as raised:
+        stats.parse_args(["missing.md"])
+    assert raised.value.code == 2
+    assert "missing.md" in capsys.readouterr().err
@@ -0,0 +1,91 @@
+"""
+Checks that the analysis service answers malformed or slow requests with a client error.
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pytest
+
+from service import AnalysisService
+
+VOCAB_MD = "## 1. Generative AI\n## 2. RAG (Retrieval-Augmented Generation)\n"
+
+
+@pytest.fixture
+def service(tmp_path: Path) -> AnalysisService:
+    """
+    A service over a small vocabulary that gives up on requests after 0.2 seconds.
+    """
+    vocab = tmp_path / "vocabulary.md"
+    vocab.write_text(VOCAB_MD, encoding="utf-8")
+    return AnalysisService(vocab=vocab, research=tmp_path / "research.md", cache_dir=None, read_timeout=0.2)
+
+
+def exchange(service: AnalysisService, raw: bytes, close: bool = True) -> Tuple[int, dict]:
+    """
+    Send `raw` to a running service and return the status and the decoded JSON answer.
+
+    With `close=False` the client keeps its side of the connection open.
+    """
+
+    async def run() -> bytes:
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            if close:
+                writer.write_eof()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response
+
+    head, _, body = asyncio.run(run()).partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def post(body: bytes, content_type: str = "application/json", length: Optional[int] = None) -> bytes:
+    """
+    Build a POST /count request.
+    """
+    length = len(body) if length is None else length
+    return (
+        f"POST /count HTTP/1.1\r\nContent-Type: {content_type}\r\nContent-Length: {length}\r\n\r\n".encode("ascii")
+        + body
+    )
+
+
+def test_count(service: AnalysisService):
+    status, answer = exchange(service, post(b'{"text": "Generative AI and RAG, generative ai."}'))
+    assert (status, answer) == (200, {"generative ai": 2, "rag": 1})
+    status, answer = exchange(service, post("RAG für alle".encode("utf-8"), content_type="text/plain"))
+    assert (status, answer) == (200, {"generative ai": 0, "rag": 1})
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        post(b'{"text": 5}'),
+        post(b'{"text": null}'),
+        post(b'["text"]'),
+        post(b"\xff", content_type="text/plain"),
+        post(b'{"text": "short"}', length=100),
+        post(b"", length=-1),
+        b"POST /count HTTP/1.1\r\nX-Long: " + b"x" * (1 << 17) + b"\r\n\r\n",
+        b"\r\n\r\n",
+    ],
+    ids=["number", "null", "list", "invalid-utf8", "short-body", "negative-length", "long-header", "no-request-line"],
+)
+def test_bad_requests_are_client_errors(service: AnalysisService, raw: bytes):
+    status, answer = exchange(service, raw)
+    assert status == 400
+    assert "error" in answer
+
+
+def test_slow_client_times_out(service: AnalysisService):
+    status, answer = exchange(service, post(b'{"text": "rag"}', length=100), close=False)
+    assert status == 408
+    assert "error" in answer
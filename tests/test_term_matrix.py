@@ -0,0 +1,71 @@
+"""
+Checks of the per-document outputs of `stats.main`: the JSON file and the term x document matrix.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+import stats
+from term_matrix import TermDocumentMatrix
+
+VOCAB_MD = "## 1. Generative AI\n## 2. Embeddings\n## 3. RAG (Retrieval-Augmented Generation)\n"
+
+
+@pytest.fixture
+def corpus(tmp_path: Path) -> Path:
+    """
+    A vocabulary and two documents below `tmp_path / "docs"`.
+    """
+    (tmp_path / "vocabulary.md").write_text(VOCAB_MD, encoding="utf-8")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text("Generative AI, generative ai and RAG.", encoding="utf-8")
+    (docs / "b.md").write_text("Embeddings for retrieval-augmented generation.", encoding="utf-8")
+    return tmp_path
+
+
+def run(corpus: Path, research, **options) -> None:
+    """
+    Run the pipeline on `research` without the graph or any cache.
+    """
+    stats.main(
+        research=research,
+        vocab=corpus / "vocabulary.md",
+        output_json=corpus / "usage_stats.json",
+        stats_only=True,
+        cache_dir=None,
+        workers=1,
+        **options,
+    )
+
+
+def test_directory_matrix_matches_document_json(corpus: Path):
+    run(corpus, corpus / "docs", output_doc_json=corpus / "docs.json", output_matrix=corpus / "matrix")
+    documents = json.loads((corpus / "docs.json").read_text(encoding="utf-8"))
+    assert documents == {"a.md": {"generative ai": 2, "rag": 1}, "b.md": {"embeddings": 1, "rag": 1}}
+
+    matrix = TermDocumentMatrix.load(corpus / "matrix")
+    assert matrix.shape == (3, 2)
+    assert matrix.totals() == json.loads((corpus / "usage_stats.json").read_text(encoding="utf-8"))
+    assert {name: matrix.document_counts(name) for name in documents} == documents
+
+
+def test_single_file_writes_requested_outputs(corpus: Path):
+    document = corpus / "docs" / "a.md"
+    run(corpus, document, output_doc_json=corpus / "docs.json", output_matrix=corpus / "matrix")
+    expected = {"generative ai": 2, "rag": 1}
+    assert json.loads((corpus / "docs.json").read_text(encoding="utf-8")) == {document.as_posix(): expected}
+
+    matrix = TermDocumentMatrix.load(corpus / "matrix")
+    assert matrix.shape == (3, 1)
+    assert matrix.document_counts(document.as_posix()) == expected
+
+
+def test_single_file_writes_no_document_json_by_default(corpus: Path, monkeypatch):
+    monkeypatch.chdir(corpus)
+    run(corpus, corpus / "docs" / "a.md")
+    assert not stats.OUTPUT_DOC_JSON.exists()
+    run(corpus, corpus / "docs")
+    assert stats.OUTPUT_DOC_JSON.exists()
@@ -0,0 +1,192 @@
+"""
+Checks of the vocabulary parser and of how surface forms are credited to canonical terms.
+
+Every form has exactly one owner, and a mention matched by several
+overlapping forms of one term counts once, with every engine that can
+resolve it. The compiled artifact is reused only for the same file and code.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import stats
+import vocabulary
+from vocabulary import (
+    CompiledVocabulary,
+    canonical_terms,
+    compile_forms,
+    fold_counts,
+    load_compiled_vocabulary,
+    parse_vocabulary,
+    surface_forms,
+)
+
+VOCAB_MD = """# Test vocabulary
+
+## 1. RAG (RAG pipeline)
+Retrieval-augmented generation.
+
+## 2. CI/CD
+Pipelines.
+
+## 3. Fine-Tuning / Finetuning
+Training on task data.
+
+## 4. LLM
+## 5. Large Language Model (LLM)
+## 6. Prompt Engineering (Prompt / Prompt Design)
+Writing prompts.
+"""
+
+
+def count(entries, text: str, engine: str = "automaton", overlap: str = "independent"):
+    """
+    Count `text` the way `stats.main` does: all forms in one pass, folded to canonical terms.
+    """
+    automaton = compile_forms(entries)
+    found = stats.count_frequencies(text, automaton.terms, engine=engine, overlap=overlap, automaton=automaton)
+    return fold_counts(entries, found)
+
+
+def test_parse_headings():
+    entries = parse_vocabulary(VOCAB_MD)
+    assert [(entry.number, entry.term, entry.aliases) for entry in entries] == [
+        (1, "rag", ("rag pipeline",)),
+        (2, "ci/cd", ()),
+        (3, "fine-tuning", ("finetuning",)),
+        (4, "llm", ()),
+        (5, "large language model", ("llm",)),
+        (6, "prompt engineering", ("prompt", "prompt design")),
+    ]
+    start, end = entries[0].definition
+    assert VOCAB_MD[start:end] == "Retrieval-augmented generation."
+    start, end = entries[3].definition
+    assert start == end
+
+
+def test_every_form_has_one_owner():
+    entries = parse_vocabulary(VOCAB_MD)
+    owners = canonical_terms(entries)
+    # A shared alias belongs to the term that spells it, else to the first entry listing it
+    assert owners["llm"] == "llm"
+    assert owners["rag pipeline"] == "rag"
+    assert owners["prompt design"] == "prompt engineering"
+    assert surface_forms(entries) == list(owners)
+
+
+@pytest.mark.parametrize("engine", stats.SCANNER_ENGINES)
+def test_overlapping_forms_count_once(engine: str, tmp_path: Path):
+    entries = parse_vocabulary(VOCAB_MD)
+    text = "One RAG pipeline here, a rag there. CI/CD and ci. LLM llm Large Language Model. Prompt design, prompt."
+    expected = {
+        "rag": 2,
+        "ci/cd": 1,
+        "fine-tuning": 0,
+        "llm": 2,
+        "large language model": 1,
+        "prompt engineering": 2,
+    }
+    if engine in stats.COUNT_ENGINES:
+        assert count(entries, text, engine=engine) == expected
+    else:
+        path = tmp_path / "doc.md"
+        path.write_text(text, encoding="utf-8")
+        automaton = compile_forms(entries)
+        found = stats.count_file(path, automaton.terms, engine=engine, automaton=automaton, cache_dir=None)
+        assert fold_counts(entries, found) == expected
+
+
+def test_policies_resolve_forms_of_one_term():
+    entries = parse_vocabulary("## 1. RAG (RAG pipeline)\n## 2. Pipeline\n")
+    text = "a rag pipeline"
+    # Forms of one term never overlap under "independent"; other terms still do
+    assert count(entries, text) == {"rag": 1, "pipeline": 1}
+    assert count(entries, text, overlap="leftmost-longest") == {"rag": 1, "pipeline": 0}
+    # "all-overlapping" counts every occurrence of every form
+    assert count(entries, text, overlap="all-overlapping") == {"rag": 2, "pipeline": 1}
+
+
+def test_compiled_vocabulary_uses_the_same_owners():
+    entries = parse_vocabulary(VOCAB_MD)
+    vocabulary = CompiledVocabulary(
+        [entry.term for entry in entries], {entry.term: entry.aliases for entry in entries}
+    )
+    text = "rag pipeline, llm, large language model, prompt"
+    assert vocabulary.count(text) == count(entries, text)
+
+
+def test_non_scanner_engines_reject_overlapping_forms(tmp_path: Path):
+    vocab = tmp_path / "vocabulary.md"
+    vocab.write_text(VOCAB_MD, encoding="utf-8")
+    with pytest.raises(SystemExit):
+        stats.parse_args(["--vocab", str(vocab), "--engine", "regex", str(vocab)])
+    entries, automaton = load_compiled_vocabulary(vocab, None)
+    with pytest.raises(ValueError):
+        stats.check_groups("regex", automaton.groups)
+    # The bundled vocabulary has no overlapping forms, so every engine can count it
+    entries, automaton = load_compiled_vocabulary(stats.VOCAB_FILE, None)
+    assert len(set(automaton.groups)) == len(automaton.groups)
+
+
+@pytest.fixture
+def artifact_dir(tmp_path: Path, monkeypatch):
+    """
+    A vocabulary file next to an empty artifact directory; `vocabulary.compile_forms` calls are counted.
+    """
+    vocab = tmp_path / "vocabulary.md"
+    vocab.write_text(VOCAB_MD, encoding="utf-8")
+    compiled = []
+
+    def counting_compile(entries, utf8=False):
+        compiled.append(len(entries))
+        return compile_forms(entries, utf8)
+
+    monkeypatch.setattr(vocabulary, "compile_forms", counting_compile)
+    return vocab, tmp_path / "artifacts", compiled
+
+
+def test_artifact_is_reused(artifact_dir):
+    vocab, cache_dir, compiled = artifact_dir
+    entries, automaton = load_compiled_vocabulary(vocab, cache_dir)
+    loaded_entries, loaded_automaton = load_compiled_vocabulary(vocab, cache_dir)
+    assert (loaded_entries, loaded_automaton.terms, loaded_automaton.groups) == (
+        entries,
+        automaton.terms,
+        automaton.groups,
+    )
+    assert compiled == [6]
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # Another vocabulary gets its own artifact
+    vocab.write_text(VOCAB_MD + "## 7. Agents\n", encoding="utf-8")
+    load_compiled_vocabulary(vocab, cache_dir)
+    assert compiled == [6, 7]
+
+
+def test_artifact_depends_on_the_code(artifact_dir, tmp_path: Path, monkeypatch):
+    vocab, cache_dir, compiled = artifact_dir
+    load_compiled_vocabulary(vocab, cache_dir)
+
+    # An edited parser or automaton must not load the artifact of the old code
+    edited = tmp_path / "automaton.py"
+    edited.write_text("# edited\n", encoding="utf-8")
+    monkeypatch.setattr(vocabulary, "_ARTIFACT_SOURCES", vocabulary._ARTIFACT_SOURCES[:1] + (edited,))
+    vocabulary._code_hash.cache_clear()
+    try:
+        load_compiled_vocabulary(vocab, cache_dir)
+    finally:
+        vocabulary._code_hash.cache_clear()
+    assert compiled == [6, 6]
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_damaged_artifact_is_rebuilt(artifact_dir):
+    vocab, cache_dir, compiled = artifact_dir
+    entries, _ = load_compiled_vocabulary(vocab, cache_dir)
+    (artifact,) = cache_dir.iterdir()
+    artifact.write_bytes(artifact.read_bytes()[:20])
+
+    assert load_compiled_vocabulary(vocab, cache_dir)[0] == entries
+    assert compiled == [6, 6]
+    assert list(cache_dir.iterdir()) == [artifact]
@@ -0,0 +1,83 @@
+"""
+Checks that watch mode survives files that cannot be read in a round.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import watch
+from watch import Watcher
+
+VOCAB_MD = "## 1. Generative AI\n## 2. Embeddings\n"
+
+
+@pytest.fixture
+def watcher(tmp_path: Path) -> Watcher:
+    """
+    A stats-only watcher over two documents, writing into `tmp_path`.
+    """
+    vocab = tmp_path / "vocabulary.md"
+    vocab.write_text(VOCAB_MD, encoding="utf-8")
+    (tmp_path / "a.md").write_text("generative ai", encoding="utf-8")
+    (tmp_path / "b.md").write_text("embeddings, generative AI", encoding="utf-8")
+    return Watcher(
+        research=[tmp_path / "a.md", tmp_path / "b.md"],
+        vocab=vocab,
+        stats_only=True,
+        output_json=tmp_path / "usage_stats.json",
+        output_doc_json=tmp_path / "doc_stats.json",
+        cache_dir=None,
+    )
+
+
+def test_half_saved_document_keeps_its_counts(watcher: Watcher, tmp_path: Path):
+    watcher.update()
+    assert watcher.totals == {"generative ai": 2, "embeddings": 1}
+
+    # Invalid UTF-8, as an editor may leave it in the middle of a save
+    (tmp_path / "a.md").write_bytes(b"embeddings \xc3")
+    watcher.update()
+    assert watcher.totals == {"generative ai": 2, "embeddings": 1}
+
+    (tmp_path / "a.md").write_text("embeddings", encoding="utf-8")
+    watcher.update()
+    assert watcher.totals == {"generative ai": 1, "embeddings": 2}
+
+
+def test_document_deleted_while_counting(watcher: Watcher, tmp_path: Path, monkeypatch):
+    watcher.update()
+    (tmp_path / "b.md").write_text("embeddings embeddings", encoding="utf-8")
+    count_file = watch.count_file
+
+    def vanished(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(watch, "count_file", vanished)
+    watcher.update()
+    assert watcher.totals == {"generative ai": 2, "embeddings": 1}
+
+    # The next round retries the document whose count failed
+    monkeypatch.setattr(watch, "count_file", count_file)
+    watcher.update()
+    assert watcher.totals == {"generative ai": 1, "embeddings": 2}
+
+
+def test_unreadable_vocabulary_keeps_the_previous_one(watcher: Watcher, tmp_path: Path):
+    watcher.update()
+    watcher.vocab.write_bytes(b"## 1. Embeddings \xff\n")
+    assert watcher.update() is False
+    assert watcher.terms == ["generative ai", "embeddings"]
+
+    watcher.vocab.write_text("## 1. Embeddings\n", encoding="utf-8")
+    watcher.update()
+    assert watcher.totals == {"embeddings": 1}
+
+
+def test_run_survives_a_failed_round(watcher: Watcher, monkeypatch, capsys):
+    def full_disk(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(watcher, "_write_outputs", full_disk)
+    watcher.run(poll=0, max_rounds=0)
+    assert "No space left on device" in capsys.readouterr().err
@@ -0,0 +1,130 @@
+"""
+vectorized.py
+
+NumPy counting engine based on token ids.
+
+The lowercased text is mapped once to an int32 array of slot ids, using the
+same alternating gap / token slots as `inverted_index.py`. Every term becomes
+a short n-gram of slot ids. All n-grams of the text are then hashed at once
+with a vectorized sliding-window polynomial hash, sorted, and every term is
+looked up with `np.searchsorted`. Candidate windows are verified against the
+real ids, so hash collisions can never change a count.
+
+Apart from one Python pass that assigns the ids, all work happens in NumPy.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from inverted_index import split_slots, term_pattern
+
+# Multiplier of the rolling hash (odd, so it is invertible modulo 2**64)
+_HASH_BASE = np.uint64(0x100000001B3)
+
+
+def _window_hashes(ids: np.ndarray, length: int) -> np.ndarray:
+    """
+    Hash every window of `length` consecutive ids (uint64 arithmetic wraps).
+    """
+    count = len(ids) - length + 1
+    values = ids.astype(np.uint64) + np.uint64(1)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(length):
+        hashes = hashes * _HASH_BASE + values[offset : offset + count]
+    return hashes
+
+
+class TokenIdCounter:
+    """
+    Slot-id array of one text plus the id of every distinct slot string.
+    """
+
+    def __init__(self, ids: np.ndarray, vocabulary: Dict[str, int]) -> None:
+        self.ids = ids
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def build(cls, text_lower: str) -> "TokenIdCounter":
+        """
+        Map an already lowercased text to its int32 slot-id array.
+        """
+        vocabulary: Dict[str, int] = {}
+        slots = split_slots(text_lower)
+        ids = np.fromiter(
+            (vocabulary.setdefault(slot, len(vocabulary)) for slot in slots),
+            dtype=np.int32,
+            count=len(slots),
+        )
+        return cls(ids, vocabulary)
+
+    def _encode(self, term: str) -> Tuple[np.ndarray, bool, bool]:
+        """
+        Turn a term into its id n-gram (empty if a slot never occurs in the text).
+        """
+        pattern, starts_with_gap, ends_with_gap = term_pattern(term)
+        if any(slot not in self.vocabulary for slot in pattern):
+            return np.zeros(0, dtype=np.int32), starts_with_gap, ends_with_gap
+        ids = np.array([self.vocabulary[slot] for slot in pattern], dtype=np.int32)
+        return ids, starts_with_gap, ends_with_gap
+
+    def count_terms(self, terms: List[str]) -> Dict[str, int]:
+        """
+        Count every term with one hashing pass per distinct n-gram length.
+        """
+        counts = {term: 0 for term in terms}
+
+        # Group the encodable terms by n-gram length
+        by_length: Dict[int, List[Tuple[str, np.ndarray, bool, bool]]] = {}
+        for term in counts:
+            if not term:
+                continue
+            ids, starts_with_gap, ends_with_gap = self._encode(term)
+            if 0 < len(ids) <= len(self.ids):
+                by_length.setdefault(len(ids), []).append((term, ids, starts_with_gap, ends_with_gap))
+
+        last_slot = len(self.ids) - 1
+        for length, group in by_length.items():
+            hashes = _window_hashes(self.ids, length)
+            order = np.argsort(hashes, kind="stable")
+            sorted_hashes = hashes[order]
+
+            term_hashes = np.concatenate([_window_hashes(ids, length) for _, ids, _, _ in group])
+            lows = np.searchsorted(sorted_hashes, term_hashes, side="left")
+            highs = np.searchsorted(sorted_hashes, term_hashes, side="right")
+
+            offsets = np.arange(length)
+            for (term, ids, starts_with_gap, ends_with_gap), low, high in zip(group, lows, highs):
+                if low == high:
+                    continue
+                starts = np.sort(order[low:high])
+
+                # Verify the real ids (guards against hash collisions)
+                starts = starts[np.all(self.ids[starts[:, None] + offsets] == ids, axis=1)]
+                # Gaps sit at even slot positions, tokens at odd ones
+                starts = starts[starts % 2 == (0 if starts_with_gap else 1)]
+                # A leading / trailing gap needs a token next to it (the `\b` rule)
+                if starts_with_gap:
+                    starts = starts[starts != 0]
+                if ends_with_gap:
+                    starts = starts[starts + length - 1 != last_slot]
+
+                counts[term] = _count_non_overlapping(starts, length)
+
+        return counts
+
+
+def _count_non_overlapping(starts: np.ndarray, length: int) -> int:
+    """
+    Count sorted match starts greedily, skipping matches that overlap the previous one.
+    """
+    if len(starts) < 2 or np.all(np.diff(starts) >= length):
+        return len(starts)
+
+    count = 0
+    last_end = 0
+    for start in starts.tolist():
+        if start >= last_end:
+            count += 1
+            last_end = start + length
+    return count
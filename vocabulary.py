@@ -0,0 +1,427 @@
+"""
+vocabulary.py
+
+Long-lived compiled vocabulary for counting many texts with the same terms.
+
+`stats.count_frequencies(text, terms)` prepares its matcher on every call.
+Services that count thousands of texts against one term list can instead
+build a `CompiledVocabulary` once and reuse it: the Aho-Corasick automaton
+is compiled a single time, and `count_many` counts an iterable of texts
+lazily, optionally spread over a thread or process pool.
+
+The module also contains the structured parser for `vocabulary.md`. Every
+`## <number>. <term>` heading becomes a `VocabularyEntry` with the canonical
+term, its aliases and the position of its definition. Aliases come from
+parentheses and from slashes with a space on at least one side:
+
+    ## 12. RAG (Retrieval-Augmented Generation)   -> "rag", alias "retrieval-augmented generation"
+    ## 16. Fine-Tuning / Finetuning                -> "fine-tuning", alias "finetuning"
+
+Slashes inside a word ("CI/CD") are kept. All surface forms are matched in
+the same counting pass and each is credited to exactly one canonical term.
+Forms of one term that overlap ("rag" inside "rag pipeline") are resolved
+leftmost-longest, so one mention counts once.
+
+`load_compiled_vocabulary` keeps the parsed entries and the compiled
+automaton as a pickled artifact keyed by the SHA-256 of the vocabulary
+file, so runs over an unchanged vocabulary neither parse nor compile it.
+The key also covers the source of this module and of `automaton.py`, so
+a change to the parsing or matching logic never reuses an old artifact.
+"""
+
+import hashlib
+import os
+import pickle
+import re
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from automaton import TermAutomaton, is_word_char
+from profiling import stage
+
+# Supported values for the `pool` argument of `count_many`
+POOL_KINDS = ("thread", "process")
+
+# Format of the compiled vocabulary artifact; bump it when the pickled classes change.
+# Changes to the parser or the automaton need no bump: their source is part of the key
+ARTIFACT_VERSION = 2
+
+# Modules whose code decides what an artifact contains (see `_artifact_key`)
+_ARTIFACT_SOURCES = (Path(__file__), Path(__file__).with_name("automaton.py"))
+
+# "## 12. RAG (...)": optional number, then the heading text
+_HEADING = re.compile(r"##+\s*(?:(\d+)\s*\.)?\s*(.*)")
+_PARENTHESES = re.compile(r"\(([^()]*)\)")
+_SLASH = re.compile(r"\s+/\s*|\s*/\s+")
+
+
+@dataclass(frozen=True)
+class VocabularyEntry:
+    """
+    One vocabulary heading.
+
+    `term` is the canonical (lowercased) term, `aliases` are the other
+    surface forms credited to it, and `definition` is the `(start, end)`
+    span of the definition text in the parsed markdown.
+    """
+
+    __slots__ = ("number", "term", "aliases", "definition")
+
+    number: Optional[int]
+    term: str
+    aliases: Tuple[str, ...]
+    definition: Tuple[int, int]
+
+    @property
+    def forms(self) -> Tuple[str, ...]:
+        """
+        The canonical term followed by its aliases.
+        """
+        return (self.term,) + self.aliases
+
+    def definition_text(self, vocab_md: str) -> str:
+        """
+        Return the definition from the markdown this entry was parsed from.
+        """
+        start, end = self.definition
+        return vocab_md[start:end]
+
+    def __reduce__(self):
+        # Frozen slotted instances cannot be restored field by field
+        return VocabularyEntry, (self.number, self.term, self.aliases, self.definition)
+
+
+def _split_forms(text: str) -> List[str]:
+    """
+    Split heading text into lowercased surface forms (parentheses and spaced slashes).
+    """
+    forms = [_PARENTHESES.sub(" ", text)] + _PARENTHESES.findall(text)
+    split = [part for form in forms for part in _SLASH.split(form)]
+    cleaned = [" ".join(part.split()).lower() for part in split]
+    return list(dict.fromkeys(form for form in cleaned if form))
+
+
+def parse_vocabulary(vocab_md: str) -> List[VocabularyEntry]:
+    """
+    Parse `vocabulary.md` into one entry per `##` heading.
+
+    The definition of an entry is the text between its heading and the next
+    heading, without surrounding whitespace.
+    """
+    entries: List[VocabularyEntry] = []
+    # Heading of the entry whose definition is still being read: (number, forms, start)
+    current: Optional[Tuple[Optional[int], List[str], int]] = None
+
+    def close(end: int) -> None:
+        number, forms, start = current
+        body = vocab_md[start:end]
+        left = start + len(body) - len(body.lstrip())
+        right = max(left, start + len(body.rstrip()))
+        entries.append(VocabularyEntry(number, forms[0], tuple(forms[1:]), (left, right)))
+
+    offset = 0
+    for line in vocab_md.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            if current is not None:
+                close(offset)
+                current = None
+            match = _HEADING.fullmatch(stripped)
+            if match:
+                forms = _split_forms(match.group(2))
+                if forms:
+                    number = int(match.group(1)) if match.group(1) else None
+                    current = (number, forms, offset + len(line))
+        offset += len(line)
+    if current is not None:
+        close(offset)
+    return entries
+
+
+def surface_forms(entries: Sequence[VocabularyEntry]) -> List[str]:
+    """
+    Return every distinct surface form (terms and aliases) to match.
+    """
+    return list(canonical_terms(entries))
+
+
+def _owners(terms: Sequence[str], aliases: Mapping[str, Sequence[str]]) -> Dict[str, str]:
+    """
+    Map every surface form to the one canonical term it is credited to.
+
+    A canonical term always owns its own spelling; an alias listed by
+    several terms belongs to the first of them.
+    """
+    owners = {term: term for term in terms}
+    for term in terms:
+        for alias in aliases.get(term, ()):
+            owners.setdefault(alias, term)
+    return owners
+
+
+def _can_overlap(first: str, second: str) -> bool:
+    """
+    Return True if `\\b`-delimited occurrences of two different forms can overlap in some text.
+    """
+    for shift in range(1 - len(second), len(first)):
+        # Lay `second` over `first`, starting `shift` characters after it
+        left = min(0, shift)
+        chars = dict(enumerate(first, start=-left))
+        if any(chars.setdefault(shift - left + index, ch) != ch for index, ch in enumerate(second)):
+            continue
+        text = "".join(chars[index] for index in range(len(chars)))
+        for before in (" ", "x"):
+            for after in (" ", "x"):
+                padded = before + text + after
+                if _bounded(padded, 1 - left, len(first)) and _bounded(padded, 1 + shift - left, len(second)):
+                    return True
+    return False
+
+
+def _bounded(text: str, start: int, length: int) -> bool:
+    """
+    Return True if `text[start:start + length]` has a word boundary on both ends.
+    """
+    end = start + length
+    return (
+        is_word_char(text[start - 1]) != is_word_char(text[start])
+        and is_word_char(text[end - 1]) != is_word_char(text[end])
+    )
+
+
+def overlap_groups(owners: Mapping[str, str]) -> List[int]:
+    """
+    Return the automaton group of every form in `owners` (in that order).
+
+    Forms of the same canonical term that can overlap each other share a
+    group, so one mention is credited to the term once (see `automaton.py`).
+    Every other form is a group of its own.
+    """
+    forms = list(owners)
+    groups = list(range(len(forms)))
+
+    def root(index: int) -> int:
+        while groups[index] != index:
+            index = groups[index]
+        return index
+
+    for first in range(len(forms)):
+        for second in range(first + 1, len(forms)):
+            same_term = owners[forms[first]] == owners[forms[second]]
+            if same_term and _can_overlap(forms[first], forms[second]):
+                groups[root(second)] = root(first)
+    return [root(index) for index in range(len(forms))]
+
+
+def compile_forms(entries: Sequence[VocabularyEntry], utf8: bool = False) -> TermAutomaton:
+    """
+    Build the automaton over all surface forms, with the overlapping forms of each term grouped.
+    """
+    owners = canonical_terms(entries)
+    return TermAutomaton(list(owners), utf8=utf8, groups=overlap_groups(owners))
+
+
+@lru_cache(maxsize=1)
+def _code_hash() -> bytes:
+    """
+    Return the SHA-256 of the artifact format and of the parser and automaton source.
+    """
+    digest = hashlib.sha256(str(ARTIFACT_VERSION).encode("ascii"))
+    for source in _ARTIFACT_SOURCES:
+        digest.update(source.read_bytes())
+    return digest.digest()
+
+
+def _artifact_key(data: bytes) -> str:
+    """
+    Return the artifact name for a vocabulary file's content.
+
+    It changes with the file content and with any change to the code that
+    parses the vocabulary or builds the automaton, so an artifact is never
+    reused across parsing or matching semantics.
+    """
+    return hashlib.sha256(_code_hash() + data).hexdigest()[:16]
+
+
+def load_compiled_vocabulary(
+    vocab: Path,
+    cache_dir: Optional[Path] = None,
+) -> Tuple[List[VocabularyEntry], TermAutomaton]:
+    """
+    Return the entries of a vocabulary file and the automaton over all their surface forms.
+
+    With a `cache_dir`, both are pickled to `<cache_dir>/<key>.pickle` on
+    the first run, and later runs over the same file content with the same
+    parser and automaton code only load that artifact (see `_artifact_key`).
+    Like every cache directory it must only be writable by trusted users,
+    because loading a pickle can run code.
+    """
+    data = vocab.read_bytes()
+    artifact = None
+    if cache_dir is not None:
+        artifact = cache_dir / f"{_artifact_key(data)}.pickle"
+        with stage("load_vocabulary"):
+            try:
+                with artifact.open("rb") as handle:
+                    stored = pickle.load(handle)
+                if stored["version"] == ARTIFACT_VERSION:
+                    return stored["entries"], stored["automaton"]
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, KeyError, TypeError):
+                # Missing or unreadable artifact: build it again
+                pass
+
+    # Same newline handling as `Path.read_text`
+    vocab_md = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    with stage("parse_vocabulary"):
+        entries = parse_vocabulary(vocab_md)
+    with stage("compile_vocabulary"):
+        automaton = compile_forms(entries)
+
+    if artifact is not None:
+        artifact.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see half an artifact
+        temporary = artifact.with_suffix(f".{os.getpid()}.tmp")
+        with temporary.open("wb") as handle:
+            pickle.dump(
+                {"version": ARTIFACT_VERSION, "entries": entries, "automaton": automaton},
+                handle,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temporary, artifact)
+    return entries, automaton
+
+
+def canonical_terms(entries: Sequence[VocabularyEntry]) -> Dict[str, str]:
+    """
+    Map every surface form to the canonical term it is credited to.
+
+    A canonical term owns its own spelling; an alias shared by several
+    entries belongs to the first of them.
+    """
+    aliases = _alias_map(entries)
+    return _owners(list(aliases), aliases)
+
+
+def _alias_map(entries: Sequence[VocabularyEntry]) -> Dict[str, Tuple[str, ...]]:
+    """
+    Map every canonical term to all of its aliases (entries may repeat a term).
+    """
+    aliases: Dict[str, Tuple[str, ...]] = {}
+    for entry in entries:
+        aliases[entry.term] = aliases.get(entry.term, ()) + entry.aliases
+    return aliases
+
+
+def fold_counts(entries: Sequence[VocabularyEntry], counts: Mapping[str, int]) -> Dict[str, int]:
+    """
+    Turn counts per surface form into counts per canonical term.
+
+    Every form is credited to its single owner (see `canonical_terms`).
+    """
+    owners = canonical_terms(entries)
+    totals = {term: 0 for term in _alias_map(entries)}
+    for form, term in owners.items():
+        totals[term] += counts.get(form, 0)
+    return totals
+
+
+class CompiledVocabulary:
+    """
+    A term list together with its compiled matcher.
+
+    `aliases` maps a term to further surface forms that are matched in the
+    same pass and credited to that term (each form to one term only, see
+    `canonical_terms`).
+    """
+
+    def __init__(self, terms: Sequence[str], aliases: Optional[Mapping[str, Sequence[str]]] = None) -> None:
+        self.terms: List[str] = list(terms)
+        self.aliases: Dict[str, Tuple[str, ...]] = {term: tuple(forms) for term, forms in (aliases or {}).items()}
+        self._owners = _owners(self.terms, self.aliases)
+        self.automaton = TermAutomaton(list(self._owners), groups=overlap_groups(self._owners))
+
+    @classmethod
+    def from_entries(cls, entries: Sequence[VocabularyEntry]) -> "CompiledVocabulary":
+        """
+        Compile the entries returned by `parse_vocabulary`.
+        """
+        aliases = _alias_map(entries)
+        return cls(list(aliases), aliases)
+
+    def count(self, text: str) -> Dict[str, int]:
+        """
+        Count every term in one text (same result as `stats.count_frequencies`
+        for the surface forms, with aliases added to their canonical term).
+        """
+        found = self.automaton.count(text.lower())
+        totals = {term: 0 for term in self.terms}
+        for form, term in self._owners.items():
+            totals[term] += found.get(form, 0)
+        return totals
+
+    def count_many(
+        self,
+        texts: Iterable[str],
+        pool: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> Iterator[Dict[str, int]]:
+        """
+        Lazily count an iterable of texts, yielding one result per text in order.
+
+        `pool` may be None (count in the calling thread), "thread" or "process".
+        Only a few texts per worker are in flight at any time, so `texts` can be
+        an unbounded stream.
+        """
+        if pool is None:
+            return (self.count(text) for text in texts)
+        if pool not in POOL_KINDS:
+            raise ValueError(f"Unknown pool kind: {pool!r} (expected one of {POOL_KINDS})")
+        return self._count_pooled(texts, pool, workers or os.cpu_count() or 1)
+
+    def _count_pooled(self, texts: Iterable[str], pool: str, workers: int) -> Iterator[Dict[str, int]]:
+        """
+        Generator behind `count_many` for the thread and process pools.
+        """
+        if pool == "thread":
+            executor = ThreadPoolExecutor(max_workers=workers)
+            task = self.count
+        else:
+            # Each worker process receives the compiled vocabulary only once
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self,),
+            )
+            task = _count_in_worker
+
+        with executor:
+            in_flight: deque = deque()
+            for text in texts:
+                in_flight.append(executor.submit(task, text))
+                if len(in_flight) >= 2 * workers:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+
+# Compiled vocabulary of the current worker process, set by the pool initializer
+_worker_vocabulary: Optional[CompiledVocabulary] = None
+
+
+def _init_worker(vocabulary: CompiledVocabulary) -> None:
+    """
+    Keep the compiled vocabulary in a freshly started worker process.
+    """
+    global _worker_vocabulary
+    _worker_vocabulary = vocabulary
+
+
+def _count_in_worker(text: str) -> Dict[str, int]:
+    """
+    Count one text with the vocabulary of this worker process.
+    """
+    return _worker_vocabulary.count(text)
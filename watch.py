@@ -0,0 +1,279 @@
+"""
+watch.py
+
+Watch mode: keep the pipeline running and refresh the outputs on every save.
+
+The inputs are polled for changes of their modification time and size. This
+only needs the standard library and behaves the same on every platform and
+editor, including editors that save by renaming a temporary file. A burst of
+saves is debounced: a round starts only once the inputs have been quiet for
+`DEBOUNCE_SECONDS`.
+
+All state is kept in memory between rounds, so a round only does the work
+the change requires:
+
+- the vocabulary is parsed again only when its file changed, and documents
+  are recounted only when its terms or aliases changed
+- only documents that changed (or were added) are counted again
+- the JSON files are written and the graph is rendered only when the counts
+  changed
+
+A file that cannot be read in a round (half saved, or deleted while it is
+counted) is reported and keeps its previous state, so the next save of it
+is picked up again.
+"""
+
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from automaton import DEFAULT_OVERLAP, TermAutomaton
+from corpus import find_documents
+from stats import (
+    CACHE_DIR,
+    DEFAULT_ENGINE,
+    DEFAULT_LAYOUT,
+    GRAPH_DPI,
+    OUTPUT_DOC_JSON,
+    OUTPUT_JSON,
+    OUTPUT_PNG,
+    RESEARCH_FILE,
+    VOCAB_FILE,
+    _write_json,
+    build_graph,
+    check_groups,
+    count_file,
+    load_text,
+)
+from vocabulary import VocabularyEntry, compile_forms, fold_counts, parse_vocabulary
+
+# How often the inputs are checked for changes
+POLL_SECONDS = 0.02
+
+# Quiet time after the last change before the outputs are recomputed
+DEBOUNCE_SECONDS = 0.1
+
+# (modification time in ns, size in bytes) of a file, None if it is missing
+Signature = Optional[Tuple[int, int]]
+
+
+def file_signature(path: Path) -> Signature:
+    """
+    Return what is compared to detect that a file changed.
+    """
+    try:
+        info = path.stat()
+    except OSError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+class Watcher:
+    """
+    In-memory pipeline state that can be brought up to date incrementally.
+    """
+
+    def __init__(
+        self,
+        research: Union[Path, Sequence[Path]] = RESEARCH_FILE,
+        vocab: Path = VOCAB_FILE,
+        engine: str = DEFAULT_ENGINE,
+        layout: str = DEFAULT_LAYOUT,
+        stats_only: bool = False,
+        output_json: Path = OUTPUT_JSON,
+        output_doc_json: Optional[Path] = None,
+        output_png: Path = OUTPUT_PNG,
+        cache_dir: Optional[Path] = CACHE_DIR,
+        dpi: int = GRAPH_DPI,
+        overlap: str = DEFAULT_OVERLAP,
+    ) -> None:
+        self.research = research
+        self.vocab = vocab
+        self.engine = engine
+        self.layout = layout
+        self.stats_only = stats_only
+        self.output_json = output_json
+        self.output_doc_json = output_doc_json
+        self.output_png = output_png
+        self.cache_dir = cache_dir
+        self.dpi = dpi
+        self.overlap = overlap
+
+        self.entries: List[VocabularyEntry] = []
+        self.terms: List[str] = []
+        self._forms: List[str] = []
+        self._automaton: Optional[TermAutomaton] = None
+        self.totals: Optional[Dict[str, int]] = None
+        self._vocab_signature: Signature = None
+        # Document -> (signature when it was counted, its counts)
+        self._documents: Dict[Path, Tuple[Signature, Dict[str, int]]] = {}
+
+    def document_paths(self) -> List[Path]:
+        """
+        Return the documents to analyze (a directory is searched again every time).
+        """
+        if isinstance(self.research, Path):
+            if self.research.is_dir():
+                return find_documents(self.research)
+            return [self.research]
+        return list(self.research)
+
+    def snapshot(self) -> Dict[Path, Signature]:
+        """
+        Return the signature of every input file.
+        """
+        return {path: file_signature(path) for path in [self.vocab] + self.document_paths()}
+
+    def update(self) -> bool:
+        """
+        Recompute what changed since the last call and refresh the outputs.
+
+        Returns True if the counts changed (and the outputs were written).
+        """
+        started = time.perf_counter()
+
+        vocab_signature = file_signature(self.vocab)
+        if vocab_signature is None:
+            # The vocabulary is being replaced; the next change triggers a new round
+            return False
+        if vocab_signature != self._vocab_signature:
+            try:
+                entries = parse_vocabulary(load_text(self.vocab))
+                automaton = compile_forms(entries)
+                check_groups(self.engine, automaton.groups)
+            except (OSError, ValueError) as error:
+                # Keep the previous vocabulary; the next save of the file is read again
+                _report(self.vocab, error)
+                return False
+            self._vocab_signature = vocab_signature
+            # Edited definitions do not change any count
+            if [entry.forms for entry in entries] != [entry.forms for entry in self.entries]:
+                self._documents.clear()
+            self.entries = entries
+            self._automaton = automaton
+            self._forms = automaton.terms
+            self.terms = list(dict.fromkeys(entry.term for entry in entries))
+
+        documents: Dict[Path, Tuple[Signature, Dict[str, int]]] = {}
+        recounted = 0
+        for path in self.document_paths():
+            signature = file_signature(path)
+            if signature is None:
+                continue
+            known = self._documents.get(path)
+            if known is None or known[0] != signature:
+                try:
+                    counts = count_file(
+                        path,
+                        self._forms,
+                        engine=self.engine,
+                        overlap=self.overlap,
+                        automaton=self._automaton,
+                        cache_dir=self.cache_dir,
+                    )
+                except (OSError, UnicodeDecodeError) as error:
+                    # Keep the previous counts under their old signature, so the next save is counted
+                    _report(path, error)
+                    if known is not None:
+                        documents[path] = known
+                    continue
+                known = (signature, fold_counts(self.entries, counts))
+                recounted += 1
+            documents[path] = known
+        removed = len(self._documents.keys() - documents.keys())
+        self._documents = documents
+
+        totals = {term: 0 for term in self.terms}
+        for _, counts in documents.values():
+            for term, count in counts.items():
+                totals[term] += count
+
+        # Compare as lists so that a reordered vocabulary also counts as a change
+        changed = self.totals is None or list(totals.items()) != list(self.totals.items())
+        if changed or recounted or removed:
+            self._write_outputs(totals, changed)
+        self.totals = totals
+
+        print(
+            f"updated in {(time.perf_counter() - started) * 1000:.1f} ms: "
+            f"{recounted} of {len(documents)} documents counted, "
+            f"counts {'changed' if changed else 'unchanged'}"
+        )
+        return changed
+
+    def _write_outputs(self, totals: Dict[str, int], changed: bool) -> None:
+        """
+        Write the JSON files, and render the graph if the totals changed.
+        """
+        single = isinstance(self.research, Path) and not self.research.is_dir()
+        if not single or self.output_doc_json is not None:
+            root = self.research if isinstance(self.research, Path) and not single else None
+            _write_json(
+                self.output_doc_json or OUTPUT_DOC_JSON,
+                {
+                    (path.relative_to(root) if root else path).as_posix(): {
+                        term: count for term, count in counts.items() if count
+                    }
+                    for path, (_, counts) in self._documents.items()
+                },
+            )
+        if not changed:
+            return
+
+        _write_json(self.output_json, totals)
+        if not self.stats_only:
+            build_graph(
+                totals,
+                layout=self.layout,
+                output=self.output_png,
+                cache_dir=self.cache_dir,
+                dpi=self.dpi,
+            )
+
+    def run(
+        self,
+        poll: float = POLL_SECONDS,
+        debounce: float = DEBOUNCE_SECONDS,
+        max_rounds: Optional[int] = None,
+    ) -> None:
+        """
+        Update once, then keep updating after every (debounced) change.
+
+        Runs until interrupted, or for `max_rounds` update rounds after the
+        first one. A round that fails to read or write a file is reported
+        and the watcher keeps running.
+        """
+        self._update_safely()
+        seen = self.snapshot()
+        pending = False
+        last_change = 0.0
+        rounds = 0
+
+        while max_rounds is None or rounds < max_rounds:
+            time.sleep(poll)
+            current = self.snapshot()
+            if current != seen:
+                seen = current
+                pending = True
+                last_change = time.monotonic()
+            elif pending and time.monotonic() - last_change >= debounce:
+                pending = False
+                rounds += 1
+                self._update_safely()
+
+    def _update_safely(self) -> None:
+        """
+        Run `update`, reporting instead of raising file errors.
+        """
+        try:
+            self.update()
+        except (OSError, UnicodeDecodeError) as error:
+            print(f"update failed: {error}", file=sys.stderr)
+
+
+def _report(path: Path, error: Exception) -> None:
+    """
+    Report a file that could not be read in this round.
+    """
+    print(f"skipped {path}: {error}", file=sys.stderr)